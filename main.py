@@ -1,5 +1,5 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request  
-from fastapi.responses import JSONResponse 
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Query  
+from fastapi.responses import JSONResponse, StreamingResponse 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
 from datetime import datetime, timedelta
+import json
 import socketio
 
 from database import get_db, init_db
@@ -19,7 +20,8 @@ from schemas import (
     WatchHistoryAdd, WatchHistoryItem,
     UserShort, FriendshipCreate, FriendshipItem, FriendshipResponse, NotificationItem,
     ChangeUsername, ChangePassword,
-    ChatCreate, ChatItem, MessageCreate, MessageItem
+    ChatCreate, ChatItem, MessageCreate, MessageItem,
+    AnimeBatchRequest
 )
 from auth import (
     get_password_hash, verify_password, create_access_token,
@@ -29,10 +31,25 @@ from auth import (
 # Импорт парсера аниме
 from parsers.kodik_api import (
     search_anime,
+    search_anime_stream,
+    suggest_titles,
     get_anime_details,
+    get_anime_batch,
+    ANIME_BATCH_MAX_IDS,
     get_video_m3u8,
+    get_video_playlists,
+    select_quality,
     get_trending_anime,
-    get_anime_by_genre 
+    get_anime_by_genre,
+    query_catalog,
+    get_genre_counts,
+    get_catalog_facets,
+    get_parser_stats,
+    prefetch_next_episode,
+    init_parsers,
+    is_offline,
+    start_background_jobs,
+    stop_background_jobs
 )
 
 from websocket_manager import (
@@ -73,6 +90,24 @@ socket_app = socketio.ASGIApp(
     app,
 )
 
+
+@app.on_event("startup")
+async def on_startup():
+    """Пулы парсеров и фоновые задачи парсера (жанровый индекс и т.д.)"""
+    try:
+        # В деградированном режиме Kodik не нужен до первого запроса видео
+        if not is_offline():
+            await init_parsers()
+    except Exception as e:
+        # Не критично: парсеры создадутся при первом запросе
+        print(f"[PARSER INIT ERROR] {e}")
+    start_background_jobs()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await stop_background_jobs()
+
 # ═══════════════════════════════════════════
 # ROOT & HEALTH
 # ═══════════════════════════════════════════
@@ -115,6 +150,12 @@ async def websocket_stats(current_user: User = Depends(get_current_active_user))
     return get_connection_stats()
 
 
+@app.get("/api/parser/stats")
+async def parser_stats(current_user: User = Depends(get_current_active_user)):
+    """Статистика кешей парсера аниме"""
+    return get_parser_stats()
+
+
 # ═══════════════════════════════════════════
 # АВТОРИЗАЦИЯ
 # ═══════════════════════════════════════════
@@ -329,6 +370,7 @@ async def get_user_history(
 async def get_genres():
     """
     Получить список всех доступных жанров
+    count — сколько аниме жанра в локальном каталоге (счётчики ведутся при индексации)
     Публичный эндпоинт (не требует авторизации)
     """
     genres = [
@@ -363,15 +405,17 @@ async def get_genres():
         {"name": "Супер сила", "slug": "супер сила", "icon": "💪"},
         {"name": "Вампиры", "slug": "вампиры", "icon": "🧛"},
     ]
-    
-    return genres
+
+    counts = get_genre_counts([genre["slug"] for genre in genres])
+    return [{**genre, "count": counts[genre["slug"]]} for genre in genres]
 
 
 @app.get("/api/genres/{genre}/anime")
 async def get_anime_by_genre_endpoint(
     genre: str,
     page: int = 1,      # ✅ Теперь используем page вместо offset
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None
 ):
     """
     Получить аниме по жанру с пагинацией
@@ -380,16 +424,20 @@ async def get_anime_by_genre_endpoint(
     page=2 → следующие 10
     page=3 → ещё 10
     и так далее...
+
+    cursor — next_cursor из предыдущего ответа (стабилен при обновлении индекса)
     """
     try:
-        data = await get_anime_by_genre(genre, page=page, per_page=limit)
+        data = await get_anime_by_genre(genre, page=page, per_page=limit, cursor=cursor)
         
         return {
             "genre": genre,
             "page": page,
             "limit": limit,
             "results": data["results"],
-            "has_more": data["has_more"]
+            "has_more": data["has_more"],
+            "next_cursor": data.get("next_cursor"),
+            "stale": data.get("stale", False)
         }
         
     except Exception as e:
@@ -400,6 +448,64 @@ async def get_anime_by_genre_endpoint(
         )
 
 
+@app.get("/api/catalog")
+async def api_catalog(
+    genre: Optional[str] = None,
+    year: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    sort: str = "rating",
+    limit: int = 20,
+    cursor: Optional[str] = None
+):
+    """
+    Каталог с фильтрами и сортировкой (по локальным данным, без запросов к Kodik)
+
+    status — ongoing / released / anons, type — anime / anime-serial
+    sort — rating (по убыванию), year (новые первыми), title
+    cursor — next_cursor из предыдущего ответа
+    Публичный эндпоинт (не требует авторизации)
+    """
+    if sort not in ("rating", "year", "title"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="sort должен быть rating, year или title"
+        )
+
+    data = await query_catalog(
+        genre=genre,
+        year=year,
+        year_from=year_from,
+        year_to=year_to,
+        status=status_filter,
+        type=type,
+        min_rating=min_rating,
+        sort=sort,
+        limit=min(max(limit, 1), 100),
+        cursor=cursor
+    )
+
+    return {
+        "count": len(data["results"]),
+        **data
+    }
+
+
+@app.get("/api/catalog/facets")
+async def api_catalog_facets():
+    """
+    Значения фильтров каталога со счётчиками (статусы, типы, годы, жанры)
+    Публичный эндпоинт (не требует авторизации)
+    """
+    return {
+        **get_catalog_facets(),
+        "genre": get_genre_counts()
+    }
+
+
 # ═══════════════════════════════════════════
 # ИЗБРАННОЕ
 # ═══════════════════════════════════════════
@@ -584,6 +690,15 @@ async def add_history(
     
     db.commit()
     db.refresh(history)
+
+    # Серия почти досмотрена — готовим ссылку на следующую
+    prefetch_next_episode(
+        data.anime_id,
+        data.episode_num,
+        data.translation_id,
+        data.progress_seconds,
+        data.duration_seconds
+    )
     
     return history
 
@@ -609,6 +724,50 @@ async def api_search(title: str, limit: int = 12):
     return {
         "query": title,
         "count": len(results),
+        "results": results,
+        "stale": any(r.get("stale") for r in results)
+    }
+
+
+@app.get("/api/search/stream")
+async def api_search_stream(title: str, limit: int = 12):
+    """
+    Поиск аниме потоком NDJSON (по событию на строку)
+
+    {"event": "results", ...} — результаты сразу после ответа Kodik (постеры могут быть null)
+    {"event": "posters", "posters": {id: url}} — постеры по мере загрузки
+    {"event": "done", "ttfb_ms", "total_ms"} — конец потока
+    Публичный эндпоинт (не требует авторизации)
+    """
+    if not title.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Введите название аниме"
+        )
+
+    async def events():
+        async for event in search_anime_stream(title, limit):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        # Без буферизации на прокси — иначе события придут одной пачкой
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/search/suggest")
+async def api_search_suggest(q: str, limit: int = 10):
+    """
+    Подсказки по началу названия (для поля поиска, на каждое нажатие клавиши)
+    Публичный эндпоинт (не требует авторизации)
+    """
+    results = suggest_titles(q, min(max(limit, 1), 50)) if q.strip() else []
+
+    return {
+        "query": q,
+        "count": len(results),
         "results": results
     }
 
@@ -623,7 +782,36 @@ async def api_trending(limit: int = 12):
     
     return {
         "count": len(results),
-        "results": results
+        "results": results,
+        "stale": any(r.get("stale") for r in results)
+    }
+
+
+@app.post("/api/anime/batch")
+async def api_anime_batch(request: AnimeBatchRequest):
+    """
+    Карточки нескольких аниме одним запросом (избранное, просмотренное, история)
+    Ошибка по отдельному ID возвращается в его элементе: {"id", "error"}
+    Публичный эндпоинт (не требует авторизации)
+    """
+    if not request.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Передайте хотя бы один ID"
+        )
+    if len(request.ids) > ANIME_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {ANIME_BATCH_MAX_IDS} ID за запрос"
+        )
+
+    results = await get_anime_batch(request.ids)
+
+    return {
+        "count": len(results),
+        "results": results,
+        "errors": sum(1 for r in results if "error" in r),
+        "stale": any(r.get("stale") for r in results)
     }
 
 
@@ -649,12 +837,37 @@ async def api_video(
     shikimori_id: str,
     episode_num: int,
     translation_id: str,
-    quality: Optional[int] = 720
+    quality: Optional[int] = 720,
+    all_qualities: bool = False
 ):
     """
     Получение ссылки на видео (m3u8)
     Публичный эндпоинт (не требует авторизации)
+
+    all_qualities=true → дополнительно ссылки на все доступные качества
+    (одним запросом к Kodik, для переключателя качества в плеере)
     """
+    if all_qualities:
+        playlists = await get_video_playlists(shikimori_id, episode_num, translation_id)
+
+        if not playlists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Видео недоступно"
+            )
+
+        # Ссылка выбранного качества — из того же набора, без повторного похода в кеш
+        url = select_quality(playlists, quality)
+
+        return {
+            "m3u8_url": url,
+            "quality": quality,
+            "qualities": {str(q): link for q, link in sorted(playlists["qualities"].items())},
+            "max_quality": playlists["max_quality"],
+            "episode": episode_num,
+            "translation_id": translation_id
+        }
+
     url = await get_video_m3u8(
         shikimori_id,
         episode_num,
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float, Index, UniqueConstraint, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -121,6 +121,66 @@ class WatchHistory(Base):
         Index('idx_history_user_watched', 'user_id', 'watched_at'),
     )
 
+class Anime(Base):
+    """
+    Локальная копия метаданных аниме (Kodik + постер Shikimori)
+    Ключ — shikimori_id в формате Kodik (z123)
+    """
+    __tablename__ = "anime"
+
+    shikimori_id = Column(String(50), primary_key=True)
+
+    title = Column(String(255))
+    title_orig = Column(String(255))
+    year = Column(Integer)
+    type = Column(String(50))
+    status = Column(String(50))
+    rating = Column(Float)
+    genres = Column(JSON, default=list)
+    screenshots = Column(JSON, default=list)
+
+    # Нормализованный material_data от Kodik целиком
+    material_data = Column(JSON, default=dict)
+
+    # Постер из Shikimori (None — постера нет)
+    poster = Column(String(500))
+    poster_updated_at = Column(DateTime(timezone=True))
+
+    # Переводы и количество серий (заполняются страницей деталей)
+    translations = Column(JSON)
+    series_count = Column(Integer)
+    details_updated_at = Column(DateTime(timezone=True))
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_anime_updated', 'updated_at'),
+    )
+
+
+class CatalogSyncState(Base):
+    """
+    Контрольная точка синхронизации каталога Kodik (parsers/catalog_sync.py)
+    После перезапуска синхронизация продолжается с сохранённого курсора
+    """
+    __tablename__ = "catalog_sync_state"
+
+    name = Column(String(50), primary_key=True)
+
+    # full — первичный обход всего списка, incremental — только обновлённое
+    phase = Column(String(20), nullable=False, default="full")
+    # Курсор следующей страницы списка Kodik (None — начать сначала)
+    cursor = Column(String(255))
+    # Самый новый updated_at Kodik, который уже сохранён целиком
+    high_water = Column(String(50))
+    # Самый новый updated_at, встреченный в текущем (незавершённом) проходе
+    pending_high_water = Column(String(50))
+
+    synced_items = Column(Integer, default=0)
+    last_run_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class Friendship(Base):
     __tablename__ = "friendships"
     
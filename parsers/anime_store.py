@@ -0,0 +1,333 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from database import SessionLocal
+from models import Anime, CatalogSyncState
+
+
+# ═══════════════════════════════════════════
+# ЛОКАЛЬНОЕ ХРАНИЛИЩЕ МЕТАДАННЫХ АНИМЕ
+# ═══════════════════════════════════════════
+# Все функции синхронные (SQLAlchemy), из async-кода вызываются через asyncio.to_thread.
+# Ошибки БД не пробрасываются: хранилище — это кеш, без него парсер работает как раньше.
+
+# Строк в одном INSERT: у Postgres лимит 65535 параметров на запрос,
+# запись Kodik — ~15 колонок, то есть ~7500 параметров на пачку
+INSERT_CHUNK_ROWS = 500
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def is_fresh(timestamp: Optional[datetime], max_age: Optional[float]) -> bool:
+    if max_age is None:
+        return True
+    if timestamp is None:
+        return False
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return _now() - timestamp <= timedelta(seconds=max_age)
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def record_from_kodik_item(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Приводит запись Kodik (search/get_list) к строке таблицы anime"""
+    raw_id = item.get("shikimori_id")
+    if not raw_id:
+        return None
+
+    sid = str(raw_id)
+    if not sid.startswith("z"):
+        sid = f"z{sid}"
+
+    material = item.get("material_data") or {}
+
+    return {
+        "shikimori_id": sid,
+        "title": item.get("title"),
+        "title_orig": material.get("title_orig"),
+        "year": _to_int(item.get("year")),
+        "type": item.get("type"),
+        "status": material.get("status"),
+        "rating": _to_float(material.get("shikimori_rating")),
+        "genres": material.get("genres") or [],
+        "screenshots": item.get("screenshots") or [],
+        "material_data": material,
+    }
+
+
+def record_to_dict(anime: Anime) -> Dict[str, Any]:
+    return {
+        "shikimori_id": anime.shikimori_id,
+        "title": anime.title,
+        "title_orig": anime.title_orig,
+        "year": anime.year,
+        "type": anime.type,
+        "status": anime.status,
+        "rating": anime.rating,
+        "genres": anime.genres or [],
+        "screenshots": anime.screenshots or [],
+        "material_data": anime.material_data or {},
+        "poster": anime.poster,
+        "poster_updated_at": anime.poster_updated_at,
+        "translations": anime.translations,
+        "series_count": anime.series_count,
+        "details_updated_at": anime.details_updated_at,
+        "updated_at": anime.updated_at,
+    }
+
+
+def save_kodik_items(items: List[Dict[str, Any]]) -> int:
+    """
+    Upsert записей Kodik в таблицу anime
+    Постер и переводы не трогаются — у них своё время обновления
+    """
+    records: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        record = record_from_kodik_item(item)
+        if record and record["shikimori_id"] not in records:
+            records[record["shikimori_id"]] = record
+
+    if not records:
+        return 0
+
+    now = _now()
+    rows = [{**record, "updated_at": now} for record in records.values()]
+
+    db = SessionLocal()
+    try:
+        # Полная страница sync-краулера — тысячи записей: пачками, но в одной транзакции
+        for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+            stmt = insert(Anime).values(rows[start:start + INSERT_CHUNK_ROWS])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Anime.shikimori_id],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in rows[0].keys()
+                    if column != "shikimori_id"
+                }
+            )
+            db.execute(stmt)
+        db.commit()
+        return len(rows)
+    except Exception as e:
+        db.rollback()
+        print(f"[ANIME STORE SAVE ERROR] {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def save_posters(posters: Dict[str, Optional[str]]) -> None:
+    """Upsert постеров {shikimori_id: poster_url | None}"""
+    if not posters:
+        return
+
+    now = _now()
+    rows = []
+    for raw_id, poster in posters.items():
+        sid = str(raw_id)
+        if not sid.startswith("z"):
+            sid = f"z{sid}"
+        rows.append({"shikimori_id": sid, "poster": poster, "poster_updated_at": now})
+
+    db = SessionLocal()
+    try:
+        stmt = insert(Anime).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Anime.shikimori_id],
+            set_={
+                "poster": stmt.excluded.poster,
+                "poster_updated_at": stmt.excluded.poster_updated_at,
+            }
+        )
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[ANIME STORE POSTER ERROR] {e}")
+    finally:
+        db.close()
+
+
+def save_details(
+    shikimori_id: str,
+    translations: List[Dict[str, Any]],
+    series_count: Optional[int],
+    item: Optional[Dict[str, Any]] = None
+) -> None:
+    """Сохраняет переводы и количество серий (страница деталей) + саму запись Kodik"""
+    if item:
+        save_kodik_items([item])
+
+    now = _now()
+    db = SessionLocal()
+    try:
+        stmt = insert(Anime).values(
+            shikimori_id=shikimori_id,
+            translations=translations,
+            series_count=series_count,
+            details_updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Anime.shikimori_id],
+            set_={
+                "translations": stmt.excluded.translations,
+                "series_count": stmt.excluded.series_count,
+                "details_updated_at": stmt.excluded.details_updated_at,
+            }
+        )
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[ANIME STORE DETAILS ERROR] {e}")
+    finally:
+        db.close()
+
+
+def get_records(shikimori_ids: List[str], max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Читает записи по ID
+
+    Args:
+        shikimori_ids: ID в формате Kodik (z123)
+        max_age: максимальный возраст записи в секундах (None — любые)
+
+    Returns:
+        Словарь {shikimori_id: запись} только для свежих записей
+    """
+    if not shikimori_ids:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Anime).filter(Anime.shikimori_id.in_(list(set(shikimori_ids)))).all()
+        return {
+            row.shikimori_id: record_to_dict(row)
+            for row in rows
+            if row.title and is_fresh(row.updated_at, max_age)
+        }
+    except Exception as e:
+        print(f"[ANIME STORE READ ERROR] {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def get_posters(shikimori_ids: List[str], max_age: Optional[float] = None) -> Dict[str, Optional[str]]:
+    """Читает постеры, для которых известен результат (в т.ч. None) не старше max_age"""
+    if not shikimori_ids:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Anime.shikimori_id, Anime.poster, Anime.poster_updated_at
+        ).filter(Anime.shikimori_id.in_(list(set(shikimori_ids)))).all()
+        return {
+            row.shikimori_id: row.poster
+            for row in rows
+            if row.poster_updated_at is not None and is_fresh(row.poster_updated_at, max_age)
+        }
+    except Exception as e:
+        print(f"[ANIME STORE READ ERROR] {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def get_catalog(updated_since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Записи с названием (для построения индексов в памяти)
+
+    Args:
+        updated_since: только записи, обновлённые начиная с этого момента (None — все)
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(Anime).filter(Anime.title.isnot(None))
+        if updated_since is not None:
+            query = query.filter(Anime.updated_at >= updated_since)
+        rows = query.all()
+        return [record_to_dict(row) for row in rows]
+    except Exception as e:
+        print(f"[ANIME STORE READ ERROR] {e}")
+        return []
+    finally:
+        db.close()
+
+
+def get_sync_state(name: str) -> Dict[str, Any]:
+    """Контрольная точка синхронизации каталога ({} — синхронизации ещё не было)"""
+    db = SessionLocal()
+    try:
+        state = db.query(CatalogSyncState).filter(CatalogSyncState.name == name).first()
+        if state is None:
+            return {}
+        return {
+            "phase": state.phase,
+            "cursor": state.cursor,
+            "high_water": state.high_water,
+            "pending_high_water": state.pending_high_water,
+            "synced_items": state.synced_items or 0,
+            "last_run_at": state.last_run_at,
+        }
+    except Exception as e:
+        print(f"[ANIME STORE READ ERROR] {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def save_sync_state(name: str, **fields: Any) -> None:
+    """Upsert контрольной точки (phase, cursor, high_water, ...)"""
+    db = SessionLocal()
+    try:
+        stmt = insert(CatalogSyncState).values(name=name, **fields)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CatalogSyncState.name],
+            set_={column: stmt.excluded[column] for column in fields}
+        )
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[ANIME STORE SYNC STATE ERROR] {e}")
+    finally:
+        db.close()
+
+
+def get_recent(limit: int) -> List[Dict[str, Any]]:
+    """Последние обновлённые записи с названием"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Anime)
+            .filter(Anime.title.isnot(None))
+            .order_by(Anime.updated_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [record_to_dict(row) for row in rows]
+    except Exception as e:
+        print(f"[ANIME STORE READ ERROR] {e}")
+        return []
+    finally:
+        db.close()
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+# Маркер отсутствия значения (None — валидное значение для негативного кеша)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU-кеш в памяти процесса с временем жизни записей.
+
+    - maxsize: максимум записей, при переполнении вытесняется самая старая по обращению
+    - ttl: время жизни обычной записи (сек)
+    - negative_ttl: время жизни записи со значением None (короткий негативный кеш)
+    - max_bytes + sizeof: ограничение по примерному объёму (sizeof(value) → байты)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        ttl: float = 3600,
+        negative_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        # key → (значение, момент истечения, размер в байтах)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            return False
+        return True
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self.bytes -= entry[2]
+
+    def peek(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Значение без обновления LRU-позиции и счётчиков"""
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Возвращает значение и обновляет LRU-позицию (default если нет или истекло)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение; None живёт negative_ttl, если ttl не задан явно"""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+
+        size = self.sizeof(value) if self.sizeof else 0
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl, size)
+        self.bytes += size
+
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and len(self._data) > 1
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Удаляет и возвращает значение (default если нет или истекло)
+        Истёкшая запись считается промахом, как в get; отсутствующая — нет (pop и для инвалидации)
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        self._remove(key)
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self.misses += 1
+            return default
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики для подбора размера кеша"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
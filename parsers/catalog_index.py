@@ -0,0 +1,237 @@
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CatalogIndex:
+    """
+    Фильтрация, сортировка и фасеты по локальному каталогу в памяти процесса
+
+    - по году, статусу, типу и жанру — множества shikimori_id (фильтр = пересечение множеств)
+    - порядок для каждой сортировки — отсортированный массив ключей: строится при первом запросе,
+      дальше каждое добавление/замена аниме переставляет только его ключ (bisect)
+    - пагинация курсором: shikimori_id последнего элемента (как в GenreIndex)
+    - счётчики жанров обновляются при каждом добавлении/замене аниме, а не на запрос
+    - жанры вне genre_mapping (приходят из URL) проверяются на запрос и в индексе не хранятся
+    Индекс меняется только из event loop, поэтому блокировки не нужны.
+    """
+
+    SORTS = ("rating", "year", "title")
+
+    def __init__(self, genre_mapping: Dict[str, List[str]]) -> None:
+        self.genre_mapping = genre_mapping
+        self._cards: Dict[str, Dict[str, Any]] = {}
+
+        self._by_year: Dict[int, Set[str]] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        # жанр genre_mapping → shikimori_id
+        self._by_genre: Dict[str, Set[str]] = {genre: set() for genre in genre_mapping}
+
+        # сортировка → [(ключ, shikimori_id)] по возрастанию ключа (только уже построенные)
+        self._order: Dict[str, List[Tuple[Any, str]]] = {}
+
+        self.queries = 0
+        self.query_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    # ─── Наполнение ───
+
+    def _matches_genre(self, card: Dict[str, Any], genre: str) -> bool:
+        synonyms = self.genre_mapping.get(genre, [genre])
+        genres = [g.lower() for g in card.get("genres") or []]
+        return any(search.lower() in g for search in synonyms for g in genres)
+
+    @staticmethod
+    def _discard(postings: Dict[Any, Set[str]], value: Any, shikimori_id: str) -> None:
+        ids = postings.get(value)
+        if ids is not None:
+            ids.discard(shikimori_id)
+            if not ids:
+                del postings[value]
+
+    def _remove(self, shikimori_id: str) -> None:
+        card = self._cards.pop(shikimori_id, None)
+        if card is None:
+            return
+        for sort, order in self._order.items():
+            entry = (self._sort_key(sort, card), shikimori_id)
+            position = bisect_left(order, entry)
+            if position < len(order) and order[position] == entry:
+                del order[position]
+        self._discard(self._by_year, card["year"], shikimori_id)
+        self._discard(self._by_status, card.get("status"), shikimori_id)
+        self._discard(self._by_type, card.get("type"), shikimori_id)
+        for ids in self._by_genre.values():
+            ids.discard(shikimori_id)
+
+    def add(self, card: Dict[str, Any]) -> None:
+        """Добавляет или заменяет аниме (карточка в формате жанровой выдачи)"""
+        shikimori_id = card["id"]
+        self._remove(shikimori_id)
+
+        card = {**card, "year": _to_int(card.get("year")), "rating": _to_float(card.get("rating"))}
+        self._cards[shikimori_id] = card
+
+        self._by_year.setdefault(card["year"], set()).add(shikimori_id)
+        self._by_status.setdefault(card.get("status"), set()).add(shikimori_id)
+        self._by_type.setdefault(card.get("type"), set()).add(shikimori_id)
+        for genre, ids in self._by_genre.items():
+            if self._matches_genre(card, genre):
+                ids.add(shikimori_id)
+        for sort, order in self._order.items():
+            insort(order, (self._sort_key(sort, card), shikimori_id))
+
+    # ─── Сортировка ───
+
+    def _sort_key(self, sort: str, card: Dict[str, Any]) -> Any:
+        if sort == "rating":
+            rating = card.get("rating")
+            return (-(rating if rating is not None else -1.0), card["id"])
+        if sort == "year":
+            return (-(card.get("year") or 0), card["id"])
+        return ((card.get("title") or "").lower(), card["id"])
+
+    def _sorted(self, sort: str) -> List[Tuple[Any, str]]:
+        if sort not in self._order:
+            self._order[sort] = sorted(
+                (self._sort_key(sort, card), sid) for sid, card in self._cards.items()
+            )
+        return self._order[sort]
+
+    # ─── Запросы ───
+
+    def query(
+        self,
+        genre: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        status: Optional[str] = None,
+        type: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        sort: str = "rating",
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], bool, Optional[str]]:
+        """
+        Выборка из каталога
+
+        Args:
+            cursor: shikimori_id последнего элемента предыдущей страницы
+                (если его больше нет в каталоге — выдача с начала)
+
+        Returns:
+            (карточки (копии), есть ли ещё, курсор следующей страницы)
+        """
+        if sort not in self.SORTS:
+            raise ValueError(f"Неизвестная сортировка: {sort}")
+
+        started = time.perf_counter()
+
+        # Пересечение множеств, начиная с самого маленького
+        sets: List[Set[str]] = []
+        # Жанр вне genre_mapping — проверяется по карточке при обходе
+        unknown_genre = None
+        if genre:
+            key = genre.lower()
+            if key in self._by_genre:
+                sets.append(self._by_genre[key])
+            else:
+                unknown_genre = key
+        if status:
+            sets.append(self._by_status.get(status, set()))
+        if type:
+            sets.append(self._by_type.get(type, set()))
+        if year_from is not None or year_to is not None:
+            low = year_from if year_from is not None else -10 ** 9
+            high = year_to if year_to is not None else 10 ** 9
+            years: Set[str] = set()
+            for year, ids in self._by_year.items():
+                if year is not None and low <= year <= high:
+                    years |= ids
+            sets.append(years)
+
+        candidates: Optional[Set[str]] = None
+        for ids in sorted(sets, key=len):
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                break
+
+        order = self._sorted(sort)
+        start_key = None
+        if cursor is not None and cursor in self._cards:
+            start_key = (self._sort_key(sort, self._cards[cursor]), cursor)
+
+        # Мало кандидатов — сортируем только их, иначе идём по готовому порядку
+        if candidates is not None and len(candidates) * 8 < len(order):
+            order = sorted((self._sort_key(sort, self._cards[sid]), sid) for sid in candidates)
+            candidates = None
+
+        position = bisect_right(order, start_key) if start_key is not None else 0
+
+        page: List[str] = []
+        has_more = False
+        for index in range(position, len(order)):
+            sid = order[index][1]
+            if candidates is not None and sid not in candidates:
+                continue
+            if unknown_genre is not None and not self._matches_genre(self._cards[sid], unknown_genre):
+                continue
+            rating = self._cards[sid].get("rating")
+            if min_rating is not None and (rating is None or rating < min_rating):
+                if sort == "rating":
+                    # Дальше рейтинг только ниже
+                    break
+                continue
+            if len(page) == limit:
+                has_more = True
+                break
+            page.append(sid)
+
+        self.queries += 1
+        self.query_time += time.perf_counter() - started
+
+        next_cursor = page[-1] if page and has_more else None
+        return [dict(self._cards[sid]) for sid in page], has_more, next_cursor
+
+    def genre_counts(self, genres: Optional[List[str]] = None) -> Dict[str, int]:
+        """Количество аниме по жанрам (поддерживаются инкрементально)"""
+        genres = genres if genres is not None else list(self.genre_mapping)
+        counts = {}
+        for genre in genres:
+            key = genre.lower()
+            if key in self._by_genre:
+                counts[genre] = len(self._by_genre[key])
+            else:
+                counts[genre] = sum(1 for card in self._cards.values() if self._matches_genre(card, key))
+        return counts
+
+    def facets(self) -> Dict[str, Dict[Any, int]]:
+        return {
+            "status": {k: len(v) for k, v in self._by_status.items() if k},
+            "type": {k: len(v) for k, v in self._by_type.items() if k},
+            "year": {k: len(v) for k, v in sorted(self._by_year.items(), key=lambda kv: kv[0] or 0, reverse=True) if k},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "anime": len(self._cards),
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_time / self.queries * 1000, 3) if self.queries else 0.0,
+        }
@@ -0,0 +1,165 @@
+"""
+Синхронизация каталога Kodik в локальную таблицу anime
+
+Отдельный процесс (не внутри API):
+    python -m parsers.catalog_sync          # постоянно, раз в CATALOG_SYNC_INTERVAL
+    python -m parsers.catalog_sync --once   # один проход
+
+Первый запуск обходит весь список Kodik (фаза full), дальше каждый проход
+забирает только записи, обновлённые после последней синхронизации (фаза incremental).
+Курсор сохраняется после каждой страницы — после перезапуска обход продолжается с места остановки.
+API подхватывает новые записи из таблицы раз в STORE_RELOAD_INTERVAL (поиск, жанры, каталог).
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from anime_parsers_ru import errors as parser_errors
+from dotenv import load_dotenv
+
+from parsers import anime_store
+from parsers.http_client import close_http_session
+from parsers.kodik_api import CATALOG_SYNC_NAME, get_kodik_parser, init_parsers
+
+load_dotenv()
+
+
+CATALOG_SYNC_PAGE_SIZE = min(int(os.getenv("CATALOG_SYNC_PAGE_SIZE", 100)), 100)
+CATALOG_SYNC_INTERVAL = int(os.getenv("CATALOG_SYNC_INTERVAL", 10 * 60))
+CATALOG_SYNC_TIMEOUT = float(os.getenv("CATALOG_SYNC_TIMEOUT", 30))
+
+
+def _item_from_raw(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись /list Kodik (по одной на перевод) → формат записи парсера"""
+    return {
+        "title": result.get("title"),
+        "title_orig": result.get("title_orig"),
+        "other_title": result.get("other_title"),
+        "type": result.get("type"),
+        "year": result.get("year"),
+        "screenshots": result.get("screenshots") or [],
+        "shikimori_id": result.get("shikimori_id"),
+        "material_data": result.get("material_data"),
+    }
+
+
+async def _fetch_page(parser, cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Страница списка Kodik, отсортированного по updated_at (новые первыми)"""
+    filters = {
+        "limit": CATALOG_SYNC_PAGE_SIZE,
+        "sort": "updated_at",
+        "order": "desc",
+        "types": "anime,anime-serial",
+        "with_material_data": "true",
+    }
+    if cursor:
+        filters["next"] = cursor
+
+    try:
+        data = await asyncio.wait_for(parser.api_request("list", filters), CATALOG_SYNC_TIMEOUT)
+    except parser_errors.NoResults:
+        return [], None
+
+    # next_page — полный URL следующей страницы, курсор в параметре next (порядок параметров любой)
+    next_page = data.get("next_page")
+    next_cursor = None
+    if next_page:
+        next_cursor = (parse_qs(urlparse(next_page).query).get("next") or [None])[0]
+    return data.get("results") or [], next_cursor
+
+
+async def sync_once() -> int:
+    """
+    Один проход синхронизации
+
+    Returns:
+        Сколько записей сохранено
+    """
+    state = await asyncio.to_thread(anime_store.get_sync_state, CATALOG_SYNC_NAME)
+    phase = state.get("phase") or "full"
+    cursor = state.get("cursor")
+    high_water = state.get("high_water")
+    pending_high_water = state.get("pending_high_water")
+    synced_items = state.get("synced_items", 0)
+
+    if cursor:
+        print(f"📚 Синхронизация каталога ({phase}): продолжаем с курсора {cursor}")
+
+    parser = await get_kodik_parser()
+    saved = 0
+
+    while True:
+        results, next_cursor = await _fetch_page(parser, cursor)
+
+        stamps = [r["updated_at"] for r in results if r.get("updated_at")]
+        if stamps:
+            pending_high_water = max(stamps + ([pending_high_water] if pending_high_water else []))
+
+        # В инкрементальной фазе нужны только записи новее уже сохранённых
+        if phase == "incremental" and high_water:
+            fresh = [r for r in results if (r.get("updated_at") or "") >= high_water]
+        else:
+            fresh = results
+
+        if fresh:
+            saved += await asyncio.to_thread(
+                anime_store.save_kodik_items, [_item_from_raw(r) for r in fresh]
+            )
+
+        reached_known = phase == "incremental" and len(fresh) < len(results)
+        now = datetime.now(timezone.utc)
+
+        if next_cursor is None or reached_known:
+            await asyncio.to_thread(
+                anime_store.save_sync_state,
+                CATALOG_SYNC_NAME,
+                phase="incremental",
+                cursor=None,
+                high_water=pending_high_water or high_water,
+                pending_high_water=None,
+                synced_items=synced_items + saved,
+                last_run_at=now
+            )
+            break
+
+        cursor = next_cursor
+        await asyncio.to_thread(
+            anime_store.save_sync_state,
+            CATALOG_SYNC_NAME,
+            phase=phase,
+            cursor=cursor,
+            pending_high_water=pending_high_water,
+            synced_items=synced_items + saved,
+            last_run_at=now
+        )
+
+    return saved
+
+
+async def run(once: bool = False) -> None:
+    await init_parsers()
+    try:
+        while True:
+            try:
+                saved = await sync_once()
+                print(f"📚 Синхронизация каталога: сохранено {saved} записей")
+            except Exception as e:
+                # Курсор последней сохранённой страницы остаётся — следующий проход продолжит с него
+                print(f"[CATALOG SYNC ERROR] {e}")
+
+            if once:
+                break
+            await asyncio.sleep(CATALOG_SYNC_INTERVAL)
+    finally:
+        await close_http_session()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Синхронизация каталога Kodik в таблицу anime")
+    arg_parser.add_argument("--once", action="store_true", help="один проход и выход")
+    args = arg_parser.parse_args()
+
+    asyncio.run(run(once=args.once))
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: upstream считается недоступным"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса (Kodik, Shikimori)
+
+    - closed: запросы идут, в скользящем окне считаются ошибки и медленные ответы
+    - open: доля ошибок превысила порог — запросы сразу отклоняются (CircuitOpenError)
+    - half_open: через open_seconds пропускается один пробный запрос;
+      если задан on_half_open, пробным запросом становится фоновое обновление, а не запрос пользователя
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        open_seconds: float = 30,
+        on_half_open: Optional[Callable[[], None]] = None
+    ) -> None:
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.on_half_open = on_half_open
+
+        # (успех, длительность)
+        self._calls: deque = deque(maxlen=window)
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.opened_count = 0
+        self.rejected = 0
+
+    @property
+    def is_closed(self) -> bool:
+        """Сервис считается здоровым (без побочных эффектов, в отличие от allow)"""
+        return self.state == "closed"
+
+    def _failure_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.opened_count += 1
+        print(f"⚡ Circuit breaker '{self.name}' открыт (ошибок: {self._failure_rate():.0%})")
+
+    def allow(self) -> bool:
+        """Можно ли сейчас отправить запрос"""
+        if self.state == "closed":
+            return True
+
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = "half_open"
+            if self.on_half_open is not None:
+                # Пробный запрос сделает фоновое обновление, текущий получит устаревшие данные
+                self.on_half_open()
+                return False
+
+        # half_open: ровно один пробный запрос
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def poll(self) -> None:
+        """
+        Ход таймера без запроса — для режима, когда в open-состоянии к сервису никто не обращается
+        (все ответы из локальных данных): open → half_open по истечении open_seconds, а если
+        пробный запрос так и не ушёл (например, был отменён) — повторный on_half_open
+        """
+        if self.state == "open":
+            self.allow()
+        elif self.state == "half_open" and not self._probe_in_flight and self.on_half_open is not None:
+            self.on_half_open()
+
+    def record(self, ok: bool, latency: float) -> None:
+        if self.state == "half_open":
+            self._probe_in_flight = False
+            if ok:
+                self.state = "closed"
+                self._calls.clear()
+                print(f"✅ Circuit breaker '{self.name}' закрыт")
+            else:
+                self._open()
+            return
+
+        self._calls.append((ok, latency))
+        if (
+            self.state == "closed"
+            and len(self._calls) >= self.min_calls
+            and self._failure_rate() >= self.failure_rate
+        ):
+            self._open()
+
+    async def call(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+        slow_after: Optional[float] = None,
+        ignore: Tuple[Type[BaseException], ...] = (),
+        is_failure: Optional[Callable[[BaseException], bool]] = None,
+        paused: Optional[Callable[[], float]] = None
+    ) -> Any:
+        """
+        Выполняет запрос через предохранитель
+
+        Args:
+            timeout: ограничение времени (таймаут считается ошибкой)
+            slow_after: ответ дольше этого считается ошибкой для статистики (но возвращается)
+            ignore: исключения, которые не считаются отказом сервиса (например, "не найдено")
+            is_failure: классификатор остальных исключений (False — ошибка запроса, а не сервиса);
+                без него отказом считается любое исключение
+            paused: сколько запрос ждал на стороне клиента (очередь лимитера) —
+                это время не входит ни в timeout, ни в задержку
+        """
+        if not self.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} недоступен")
+
+        started = time.monotonic()
+        paused = paused or (lambda: 0.0)
+        try:
+            result = await self._run(factory, timeout, paused)
+        except ignore:
+            self.record(True, time.monotonic() - started - paused())
+            raise
+        except asyncio.CancelledError:
+            # Отмена — не отказ сервиса, но пробный слот нужно освободить
+            if self.state == "half_open":
+                self._probe_in_flight = False
+            raise
+        except Exception as e:
+            failed = is_failure is None or is_failure(e)
+            self.record(not failed, time.monotonic() - started - paused())
+            raise
+
+        latency = time.monotonic() - started - paused()
+        self.record(slow_after is None or latency <= slow_after, latency)
+        return result
+
+    @staticmethod
+    async def _run(
+        factory: Callable[[], Awaitable[Any]],
+        timeout: Optional[float],
+        paused: Callable[[], float]
+    ) -> Any:
+        """Выполняет запрос; таймаут отсчитывается без времени ожидания на стороне клиента"""
+        if not timeout:
+            return await factory()
+
+        started = time.monotonic()
+        task = asyncio.ensure_future(factory())
+        try:
+            while True:
+                remaining = timeout + paused() - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+                if done:
+                    return task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = [latency for _, latency in self._calls]
+        return {
+            "state": self.state,
+            "failure_rate": round(self._failure_rate(), 4),
+            "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "window_calls": len(self._calls),
+            "opened_count": self.opened_count,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,117 @@
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class GenreIndex:
+    """
+    Инвертированный индекс жанр → shikimori_id поверх списка Kodik
+
+    Индекс перестраивается целиком (build) фоновой задачей, запросы только читают его.
+    Порядок аниме внутри жанра совпадает с порядком в списке Kodik,
+    поэтому страницы — это срез списка, а курсор — shikimori_id последнего элемента.
+    """
+
+    def __init__(self, genre_mapping: Dict[str, List[str]]) -> None:
+        self.genre_mapping = genre_mapping
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._by_genre: Dict[str, List[str]] = {}
+        self._positions: Dict[str, Dict[str, int]] = {}
+        self.built_at: Optional[float] = None
+        self.build_duration: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def _synonyms(self, genre: str) -> List[str]:
+        genre_lower = genre.lower()
+        return self.genre_mapping.get(genre_lower, [genre_lower])
+
+    def _match(self, item_genres: List[str], synonyms: List[str]) -> bool:
+        return any(
+            any(search.lower() in g.lower() for g in item_genres)
+            for search in synonyms
+        )
+
+    def _index_genre(self, genre: str, items: Dict[str, Dict[str, Any]]) -> List[str]:
+        synonyms = self._synonyms(genre)
+        return [
+            sid for sid, item in items.items()
+            if self._match(item.get("genres") or [], synonyms)
+        ]
+
+    def build(self, items: List[Dict[str, Any]]) -> None:
+        """
+        Перестраивает индекс
+
+        Args:
+            items: карточки аниме в порядке Kodik ({"id", "genres", ...}), дубликаты по id отбрасываются
+        """
+        started = time.monotonic()
+
+        unique: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            sid = item.get("id")
+            if sid and sid not in unique:
+                unique[sid] = item
+
+        by_genre = {genre: self._index_genre(genre, unique) for genre in self.genre_mapping}
+
+        # Атомарная подмена — читатели видят либо старый, либо новый индекс
+        self._items = unique
+        self._by_genre = by_genre
+        self._positions = {
+            genre: {sid: pos for pos, sid in enumerate(ids)}
+            for genre, ids in by_genre.items()
+        }
+        self.built_at = time.time()
+        self.build_duration = time.monotonic() - started
+
+    def _genre_ids(self, genre: str) -> Tuple[List[str], Dict[str, int]]:
+        key = genre.lower()
+        if key in self._by_genre:
+            return self._by_genre[key], self._positions[key]
+        # Жанр вне genre_mapping (приходит из URL) — считаем на запрос и не сохраняем,
+        # иначе произвольные строки копятся в индексе до следующего build
+        ids = self._index_genre(key, self._items)
+        return ids, {sid: pos for pos, sid in enumerate(ids)}
+
+    def page(
+        self,
+        genre: str,
+        page: int = 1,
+        per_page: int = 10,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], bool, Optional[str]]:
+        """
+        Срез жанра
+
+        Args:
+            cursor: shikimori_id последнего элемента предыдущей страницы
+                (переживает перестроение индекса; если id пропал — используется page)
+
+        Returns:
+            (карточки страницы (копии), есть ли ещё, курсор следующей страницы)
+        """
+        ids, positions = self._genre_ids(genre)
+
+        offset = (max(page, 1) - 1) * per_page
+        if cursor is not None:
+            position = positions.get(cursor)
+            if position is not None:
+                offset = position + 1
+
+        page_ids = ids[offset:offset + per_page]
+        has_more = offset + per_page < len(ids)
+        next_cursor = page_ids[-1] if page_ids and has_more else None
+
+        return [dict(self._items[sid]) for sid in page_ids], has_more, next_cursor
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "anime": len(self._items),
+            "genres": {genre: len(ids) for genre, ids in self._by_genre.items()},
+            "age_seconds": round(time.time() - self.built_at, 1) if self.built_at else None,
+            "build_duration": round(self.build_duration, 3) if self.build_duration is not None else None,
+        }
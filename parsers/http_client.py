@@ -0,0 +1,228 @@
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+from yarl import URL
+
+from parsers.rate_limiter import AdaptiveRateLimiter
+
+load_dotenv()
+
+
+# ═══════════════════════════════════════════
+# ОБЩИЙ HTTP-КЛИЕНТ ДЛЯ ПАРСЕРОВ
+# ═══════════════════════════════════════════
+# Один aiohttp.ClientSession (один пул соединений) на Kodik и Shikimori:
+# keep-alive между запросами, кеш DNS, лимиты на хост
+# и адаптивный лимит частоты запросов к каждому хосту.
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", 30))
+
+# Адаптивный лимит запросов на каждый хост (запросов/сек)
+RATE_LIMIT_INITIAL = float(os.getenv("RATE_LIMIT_INITIAL", 5))
+RATE_LIMIT_MIN = float(os.getenv("RATE_LIMIT_MIN", 0.5))
+RATE_LIMIT_MAX = float(os.getenv("RATE_LIMIT_MAX", 50))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 5))
+RATE_LIMIT_MAX_RETRY_AFTER = float(os.getenv("RATE_LIMIT_MAX_RETRY_AFTER", 60))
+
+_session: Optional[aiohttp.ClientSession] = None
+
+# Счётчики соединений: новые (TCP + TLS) и переиспользованные из пула
+_connection_stats = {
+    "created": 0,
+    "reused": 0,
+    "requests": 0,
+}
+
+
+# host → лимитер (общие на весь процесс)
+_rate_limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+
+def get_rate_limiter(host: str) -> AdaptiveRateLimiter:
+    limiter = _rate_limiters.get(host)
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(
+            host,
+            rate=RATE_LIMIT_INITIAL,
+            min_rate=RATE_LIMIT_MIN,
+            max_rate=RATE_LIMIT_MAX,
+            burst=RATE_LIMIT_BURST,
+            max_retry_after=RATE_LIMIT_MAX_RETRY_AFTER
+        )
+        _rate_limiters[host] = limiter
+    return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Any]:
+    return {host: limiter.stats() for host, limiter in _rate_limiters.items()}
+
+
+class LimiterWait:
+    """
+    Сколько вызов парсера простоял в очереди лимитеров (включая текущее ожидание)
+    Это время клиента, а не upstream — circuit breaker не считает его в задержку и таймаут
+    """
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self._since: Optional[float] = None
+
+    def start(self) -> None:
+        self._since = time.monotonic()
+
+    def stop(self) -> None:
+        if self._since is not None:
+            self.total += time.monotonic() - self._since
+            self._since = None
+
+    def __call__(self) -> float:
+        if self._since is None:
+            return self.total
+        return self.total + time.monotonic() - self._since
+
+
+# Ожидание лимитера текущего вызова парсера (запросы идут в его задаче)
+_limiter_wait: ContextVar[Optional[LimiterWait]] = ContextVar("limiter_wait", default=None)
+
+
+@contextmanager
+def tracking_limiter_wait(wait: LimiterWait) -> Iterator[LimiterWait]:
+    """Запросы внутри блока добавляют время ожидания токена в wait"""
+    token = _limiter_wait.set(wait)
+    try:
+        yield wait
+    finally:
+        _limiter_wait.reset(token)
+
+
+async def _on_connection_create_end(session, context, params) -> None:
+    _connection_stats["created"] += 1
+
+
+async def _on_connection_reuseconn(session, context, params) -> None:
+    _connection_stats["reused"] += 1
+
+
+async def _on_request_start(session, context, params) -> None:
+    _connection_stats["requests"] += 1
+
+
+async def acquire_rate_limit(url: Any) -> None:
+    """
+    Ждёт токен лимитера хоста (до запроса: время в очереди не входит в таймаут aiohttp)
+    Ожидание добавляется в LimiterWait текущего вызова парсера, если он отслеживается
+    """
+    wait = _limiter_wait.get()
+    if wait is not None:
+        wait.start()
+    try:
+        await get_rate_limiter(URL(str(url)).host).acquire()
+    finally:
+        if wait is not None:
+            wait.stop()
+
+
+async def _on_request_end(session, context, params) -> None:
+    response = params.response
+    get_rate_limiter(params.url.host).on_response(
+        response.status, response.headers.get("Retry-After")
+    )
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Общая сессия (создаётся при первом вызове, нужен запущенный event loop)"""
+    global _session
+    if _session is None or _session.closed:
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(_on_connection_create_end)
+        trace.on_connection_reuseconn.append(_on_connection_reuseconn)
+        trace.on_request_start.append(_on_request_start)
+        trace.on_request_end.append(_on_request_end)
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=HTTP_TOTAL_TIMEOUT,
+                connect=HTTP_CONNECT_TIMEOUT,
+            ),
+            trace_configs=[trace],
+        )
+    return _session
+
+
+class RateLimitedSession:
+    """
+    Общая сессия в том виде, в каком её использует AsyncSession из anime_parsers_ru
+    (async with session.request(...)): сначала токен лимитера, потом запрос —
+    ClientTimeout отсчитывается уже после очереди
+    """
+
+    @property
+    def closed(self) -> bool:
+        return get_http_session().closed
+
+    @asynccontextmanager
+    async def request(self, method: str, url: Any, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        await acquire_rate_limit(url)
+        async with get_http_session().request(method, url, **kwargs) as response:
+            yield response
+
+    async def close(self) -> None:
+        # Сессия общая — закрывается только в close_http_session
+        pass
+
+
+def attach_http_session(parser: Any) -> Any:
+    """
+    Подменяет внутреннюю сессию парсера anime_parsers_ru на общую
+    (AsyncSession создаёт свою aiohttp-сессию лениво, только если _session пуст)
+    """
+    requests = getattr(parser, "requests", None)
+    if requests is not None and hasattr(requests, "_session"):
+        requests._session = RateLimitedSession()
+    return parser
+
+
+async def close_http_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def get_http_pool_stats() -> Dict[str, Any]:
+    """Использование пула соединений"""
+    created = _connection_stats["created"]
+    reused = _connection_stats["reused"]
+    stats: Dict[str, Any] = {
+        **_connection_stats,
+        "reuse_rate": round(reused / (created + reused), 4) if created + reused else 0.0,
+        "limit": HTTP_POOL_LIMIT,
+        "limit_per_host": HTTP_POOL_LIMIT_PER_HOST,
+    }
+
+    if _session is not None and not _session.closed:
+        connector = _session.connector
+        # Приватные поля aiohttp — читаем осторожно
+        acquired = getattr(connector, "_acquired", None)
+        idle = getattr(connector, "_conns", None)
+        stats["in_use"] = len(acquired) if acquired is not None else None
+        stats["idle"] = sum(len(conns) for conns in idle.values()) if idle is not None else None
+
+    return stats
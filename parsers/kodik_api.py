@@ -1,34 +1,250 @@
 import re
-from typing import List, Dict, Any, Optional
+import os
+import json
+import time
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from anime_parsers_ru import KodikParserAsync, ShikimoriParserAsync
+from anime_parsers_ru import errors as parser_errors
+from dotenv import load_dotenv
 import asyncio
+import aiohttp
+from datetime import datetime, timedelta, timezone
+
+from parsers.cache import TTLCache, MISSING
+from parsers import anime_store
+from parsers.catalog_index import CatalogIndex
+from parsers.genre_index import GenreIndex
+from parsers.singleflight import SingleFlight
+from parsers.circuit_breaker import CircuitBreaker, CircuitOpenError
+from parsers.http_client import (
+    LimiterWait,
+    attach_http_session,
+    close_http_session,
+    get_http_pool_stats,
+    get_rate_limiter_stats,
+    tracking_limiter_wait
+)
+from parsers.parser_pool import ParserPool
+from parsers.search_index import SearchIndex
+
+load_dotenv()
 
 
 # ═══════════════════════════════════════════
-# SINGLETON ПАРСЕРЫ
+# НАСТРОЙКИ КЕШЕЙ
 # ═══════════════════════════════════════════
 
-_kodik_parser: Optional[KodikParserAsync] = None
-_shikimori_parser: Optional[ShikimoriParserAsync] = None
-_parser_lock = asyncio.Lock()
+POSTER_CACHE_MAXSIZE = int(os.getenv("POSTER_CACHE_MAXSIZE", 5000))
+POSTER_CACHE_TTL = int(os.getenv("POSTER_CACHE_TTL", 24 * 3600))
+POSTER_CACHE_NEGATIVE_TTL = int(os.getenv("POSTER_CACHE_NEGATIVE_TTL", 10 * 60))
+
+# Сколько считаются свежими данные из таблицы anime (сек)
+ANIME_STORE_MAX_AGE = int(os.getenv("ANIME_STORE_MAX_AGE", 6 * 3600))
+ANIME_STORE_POSTER_MAX_AGE = int(os.getenv("ANIME_STORE_POSTER_MAX_AGE", 7 * 24 * 3600))
+
+# Shikimori GraphQL отдаёт не больше 50 записей на запрос
+POSTER_BATCH_SIZE = min(int(os.getenv("POSTER_BATCH_SIZE", 50)), 50)
+
+# Кеш поиска: {нормализованный запрос: (limit, результаты)}
+SEARCH_CACHE_MAXSIZE = int(os.getenv("SEARCH_CACHE_MAXSIZE", 2000))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 10 * 60))
+SEARCH_CACHE_EMPTY_TTL = int(os.getenv("SEARCH_CACHE_EMPTY_TTL", 60))
+SEARCH_CACHE_MIN_PREFIX = int(os.getenv("SEARCH_CACHE_MIN_PREFIX", 3))
+
+# Локальный триграммный индекс: ниже MIN_SCORE — не совпадение,
+# от GOOD_SCORE — хорошее совпадение (Kodik не запрашивается)
+SEARCH_INDEX_MIN_SCORE = float(os.getenv("SEARCH_INDEX_MIN_SCORE", 0.45))
+SEARCH_INDEX_GOOD_SCORE = float(os.getenv("SEARCH_INDEX_GOOD_SCORE", 0.75))
+# Сколько записей просить у Kodik на каждый вариант запроса (× limit)
+SEARCH_KODIK_OVERFETCH = int(os.getenv("SEARCH_KODIK_OVERFETCH", 5))
+# Насколько другая раскладка/транслитерация должна совпадать лучше исходного запроса
+SPELLING_MIN_GAIN = float(os.getenv("SPELLING_MIN_GAIN", 0.1))
+# Потоковый поиск: по сколько постеров запрашивать у Shikimori (каждая пачка — отдельный патч)
+SEARCH_STREAM_POSTER_CHUNK = max(int(os.getenv("SEARCH_STREAM_POSTER_CHUNK", 4)), 1)
+
+# Жанровый индекс: сколько страниц по 100 записей обходить и как часто перестраивать
+GENRE_INDEX_PAGES = int(os.getenv("GENRE_INDEX_PAGES", 50))
+GENRE_INDEX_REFRESH_INTERVAL = int(os.getenv("GENRE_INDEX_REFRESH_INTERVAL", 3600))
+
+# Как часто подхватывать в индексы то, что воркер синхронизации каталога записал в хранилище
+STORE_RELOAD_INTERVAL = int(os.getenv("STORE_RELOAD_INTERVAL", 5 * 60))
+# Имя контрольной точки воркера синхронизации (parsers.catalog_sync)
+CATALOG_SYNC_NAME = "kodik"
+
+# Кеш m3u8: TTL берётся из срока подписи ссылки (минус запас), иначе — по умолчанию
+M3U8_CACHE_MAXSIZE = int(os.getenv("M3U8_CACHE_MAXSIZE", 10000))
+M3U8_CACHE_DEFAULT_TTL = int(os.getenv("M3U8_CACHE_DEFAULT_TTL", 30 * 60))
+M3U8_CACHE_MAX_TTL = int(os.getenv("M3U8_CACHE_MAX_TTL", 6 * 3600))
+M3U8_EXPIRY_MARGIN = int(os.getenv("M3U8_EXPIRY_MARGIN", 10 * 60))
+M3U8_REFRESH_BEFORE = int(os.getenv("M3U8_REFRESH_BEFORE", 10 * 60))
+
+# Переводы и серии аниме: вышедшие почти не меняются, онгоинги — после выхода серии
+TRANSLATIONS_CACHE_MAXSIZE = int(os.getenv("TRANSLATIONS_CACHE_MAXSIZE", 10000))
+TRANSLATIONS_RELEASED_TTL = int(os.getenv("TRANSLATIONS_RELEASED_TTL", 30 * 24 * 3600))
+TRANSLATIONS_ONGOING_TTL = int(os.getenv("TRANSLATIONS_ONGOING_TTL", 6 * 3600))
+TRANSLATIONS_AIR_MARGIN = int(os.getenv("TRANSLATIONS_AIR_MARGIN", 15 * 60))
+TRANSLATIONS_MAX_SCHEDULED = int(os.getenv("TRANSLATIONS_MAX_SCHEDULED", 2000))
+
+# Предзагрузка следующей серии после такой доли просмотра текущей
+PREFETCH_PROGRESS_THRESHOLD = float(os.getenv("PREFETCH_PROGRESS_THRESHOLD", 0.7))
+
+# Фоновый прогрев: trending и первые страницы каждого жанра
+PREWARM_INTERVAL = int(os.getenv("PREWARM_INTERVAL", 5 * 60))
+PREWARM_TRENDING_LIMIT = int(os.getenv("PREWARM_TRENDING_LIMIT", 24))
+PREWARM_GENRE_PAGES = int(os.getenv("PREWARM_GENRE_PAGES", 2))
+PREWARM_GENRE_PER_PAGE = int(os.getenv("PREWARM_GENRE_PER_PAGE", 10))
+
+# Таймауты upstream и circuit breaker
+KODIK_TIMEOUT = float(os.getenv("KODIK_TIMEOUT", 15))
+SHIKIMORI_TIMEOUT = float(os.getenv("SHIKIMORI_TIMEOUT", 10))
+UPSTREAM_SLOW_FRACTION = float(os.getenv("UPSTREAM_SLOW_FRACTION", 0.5))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+
+# Пулы парсеров: сколько экземпляров и как выбирать (least_busy | round_robin)
+KODIK_PARSER_POOL_SIZE = max(1, int(os.getenv("KODIK_PARSER_POOL_SIZE", 1)))
+SHIKIMORI_PARSER_POOL_SIZE = max(1, int(os.getenv("SHIKIMORI_PARSER_POOL_SIZE", 1)))
+PARSER_POOL_STRATEGY = os.getenv("PARSER_POOL_STRATEGY", "least_busy")
+
+# Пакетный запрос карточек: максимум ID за раз
+ANIME_BATCH_MAX_IDS = int(os.getenv("ANIME_BATCH_MAX_IDS", 50))
+
+# Деградированный режим: auto — пока Kodik недоступен (breaker не закрыт), on — всегда, off — никогда
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "auto").lower()
+# Как часто фоновые циклы проверяют, не пора ли пробовать Kodik снова (режим auto)
+OFFLINE_POLL_INTERVAL = float(os.getenv("OFFLINE_POLL_INTERVAL", 5))
+
+# Последние удачные ответы — отдаются с пометкой stale, пока upstream недоступен
+STALE_CACHE_MAXSIZE = int(os.getenv("STALE_CACHE_MAXSIZE", 5000))
+STALE_CACHE_MAX_BYTES = int(os.getenv("STALE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+STALE_MAX_AGE = int(os.getenv("STALE_MAX_AGE", 7 * 24 * 3600))
+
+# Кеш постеров: {clean_shikimori_id: poster_url | None}
+_poster_cache = TTLCache(
+    maxsize=POSTER_CACHE_MAXSIZE,
+    ttl=POSTER_CACHE_TTL,
+    negative_ttl=POSTER_CACHE_NEGATIVE_TTL
+)
+
+
+def _json_size(value: Any) -> int:
+    """Примерный объём значения в памяти — размер его JSON в байтах"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+_search_cache = TTLCache(
+    maxsize=SEARCH_CACHE_MAXSIZE,
+    ttl=SEARCH_CACHE_TTL,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    sizeof=_json_size
+)
+# Ответы, собранные фильтрацией более короткого запроса
+_search_prefix_hits = 0
+
+# Последние удачные ответы: {("search", запрос) | ("trending",) | ("genre", ...): ответ}
+_last_good = TTLCache(
+    maxsize=STALE_CACHE_MAXSIZE,
+    ttl=STALE_MAX_AGE,
+    max_bytes=STALE_CACHE_MAX_BYTES,
+    sizeof=_json_size
+)
+
+
+def _mark_stale(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Копии карточек с пометкой stale: true"""
+    return [{**item, "stale": True} for item in items]
+
+
+# Кеш m3u8: {(shikimori_id, серия, перевод): {"qualities", "max_quality", "expires_at"}}
+_m3u8_cache = TTLCache(maxsize=M3U8_CACHE_MAXSIZE, ttl=M3U8_CACHE_DEFAULT_TTL)
+_m3u8_background_refreshes = 0
+
+# Переводы и серии: {shikimori_id: {"translations", "series_count"}}, TTL по статусу аниме
+_translations_cache = TTLCache(maxsize=TRANSLATIONS_CACHE_MAXSIZE, ttl=TRANSLATIONS_RELEASED_TTL)
+# Запланированные обновления онгоингов после выхода серии: {shikimori_id: TimerHandle}
+_translations_refreshes: Dict[str, asyncio.TimerHandle] = {}
+_translations_refreshed = 0
+
+# Предзагруженные, но ещё не запрошенные ссылки следующих серий
+_prefetched_keys = TTLCache(maxsize=M3U8_CACHE_MAXSIZE, ttl=M3U8_CACHE_DEFAULT_TTL)
+_prefetch_started = 0
+_prefetch_hits = 0
+# Предзагрузки в процессе: повторные триггеры той же серии не запускают и не считают новую
+_prefetch_in_flight: set = set()
+
+
+# ═══════════════════════════════════════════
+# ПУЛЫ ПАРСЕРОВ
+# ═══════════════════════════════════════════
+
+_kodik_pool = ParserPool("kodik", PARSER_POOL_STRATEGY)
+_shikimori_pool = ParserPool("shikimori", PARSER_POOL_STRATEGY)
+
+
+def _create_kodik_parsers(count: int) -> List[KodikParserAsync]:
+    """Токен Kodik получается один раз (синхронным запросом) и раздаётся всем экземплярам"""
+    first = KodikParserAsync(validate_token=False)
+    return [first] + [
+        KodikParserAsync(token=first.TOKEN, validate_token=False)
+        for _ in range(count - 1)
+    ]
+
+
+async def _create_kodik_pool() -> None:
+    """
+    Пул Kodik: получение токена — уже запрос к upstream, поэтому идёт через breaker Kodik
+    (без сети любая ошибка создания считается отказом и переводит режим auto в offline)
+    """
+    parsers = await _kodik_breaker.call(
+        lambda: asyncio.to_thread(_create_kodik_parsers, KODIK_PARSER_POOL_SIZE),
+        timeout=KODIK_TIMEOUT
+    )
+    _kodik_pool.fill([attach_http_session(parser) for parser in parsers])
+
+
+async def _create_shikimori_pool() -> None:
+    _shikimori_pool.fill([
+        attach_http_session(ShikimoriParserAsync())
+        for _ in range(SHIKIMORI_PARSER_POOL_SIZE)
+    ])
+
+
+async def _init_kodik_pool() -> None:
+    if not _kodik_pool.ready:
+        await _flight.do(("init_parsers", "kodik"), _create_kodik_pool)
+
+
+async def _init_shikimori_pool() -> None:
+    if not _shikimori_pool.ready:
+        await _flight.do(("init_parsers", "shikimori"), _create_shikimori_pool)
+
+
+async def init_parsers() -> None:
+    """
+    Создаёт пулы парсеров (вызывается при старте приложения)
+    Пулы независимы: ошибка Kodik не оставляет пустым пул Shikimori.
+    Одновременные вызовы до готовности ждут одну и ту же инициализацию
+    """
+    results = await asyncio.gather(_init_kodik_pool(), _init_shikimori_pool(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
 
 
 async def get_kodik_parser() -> KodikParserAsync:
-    """Singleton для Kodik парсера"""
-    global _kodik_parser
-    async with _parser_lock:
-        if _kodik_parser is None:
-            _kodik_parser = KodikParserAsync(validate_token=False)
-        return _kodik_parser
+    """
+    Экземпляр Kodik парсера из пула (без блокировок после инициализации)
+    Пока Kodik недоступен — CircuitOpenError или ошибка создания парсера
+    """
+    await _init_kodik_pool()
+    return _kodik_pool.pick()
 
 
 async def get_shikimori_parser() -> ShikimoriParserAsync:
-    """Singleton для Shikimori парсера"""
-    global _shikimori_parser
-    async with _parser_lock:
-        if _shikimori_parser is None:
-            _shikimori_parser = ShikimoriParserAsync()
-        return _shikimori_parser
+    """Экземпляр Shikimori парсера из пула (без блокировок после инициализации)"""
+    await _init_shikimori_pool()
+    return _shikimori_pool.pick()
 
 
 # Для обратной совместимости
@@ -36,6 +252,184 @@ async def get_parser() -> KodikParserAsync:
     return await get_kodik_parser()
 
 
+# ═══════════════════════════════════════════
+# SINGLE-FLIGHT ДЛЯ ЗАПРОСОВ К KODIK/SHIKIMORI
+# ═══════════════════════════════════════════
+
+_flight = SingleFlight()
+
+
+def _on_kodik_half_open() -> None:
+    # Пробный запрос — обновление снимка каталога (заодно освежает данные)
+    _run_in_background(refresh_catalog_snapshot())
+
+
+def _on_shikimori_half_open() -> None:
+    # Пробный запрос — постеры текущего trending (или Cowboy Bebop, id 1)
+    probe_ids = [
+        get_clean_shikimori_id(item["id"]) for item in _catalog_snapshot["trending"]
+    ][:POSTER_BATCH_SIZE] or ["1"]
+    _run_in_background(_probe_shikimori(probe_ids))
+
+
+async def _probe_shikimori(clean_ids: List[str]) -> None:
+    try:
+        posters = await _fetch_posters_chunk(clean_ids)
+        _store_in_background(
+            anime_store.save_posters,
+            {normalize_shikimori_id(cid): poster for cid, poster in posters.items() if poster is not None}
+        )
+    except Exception as e:
+        print(f"[SHIKIMORI PROBE ERROR] {e}")
+
+
+_kodik_breaker = CircuitBreaker(
+    "kodik",
+    open_seconds=BREAKER_OPEN_SECONDS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    on_half_open=_on_kodik_half_open
+)
+# Плеер Kodik (get_link) — отдельный хост и отдельные отказы: не переводит каталог в offline
+_kodik_player_breaker = CircuitBreaker(
+    "kodik_player",
+    open_seconds=BREAKER_OPEN_SECONDS,
+    failure_rate=BREAKER_FAILURE_RATE
+)
+_shikimori_breaker = CircuitBreaker(
+    "shikimori",
+    open_seconds=BREAKER_OPEN_SECONDS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    on_half_open=_on_shikimori_half_open
+)
+
+
+def is_offline() -> bool:
+    """
+    Деградированный режим: каталог (поиск, trending, жанры, детали) отдаётся
+    только из локальных данных с пометкой stale, запросов к Kodik и Shikimori нет
+    """
+    if OFFLINE_MODE == "on":
+        return True
+    if OFFLINE_MODE == "off":
+        return False
+    return not _kodik_breaker.is_closed
+
+
+# Код ответа в тексте ServiceError anime_parsers_ru:
+#   Kodik:     'Произошла ошибка при запросе. Ожидался код "200", получен: "503"'
+#   Shikimori: 'Сервер не вернул ожидаемый код 200. Код: "503"'
+_ERROR_STATUS_RE = re.compile(r'(?:получен|Код): "(\d{3})"', re.IGNORECASE)
+
+
+def _error_status(error: BaseException) -> Optional[int]:
+    """HTTP-код из ServiceError (None — ошибка не про код ответа: битый JSON, error в ответе)"""
+    # Shikimori get_anime_list: ServiceError('... Получен: ', status_code)
+    for arg in error.args[1:]:
+        if isinstance(arg, int):
+            return arg
+    match = _ERROR_STATUS_RE.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    """
+    Отказ upstream для circuit breaker: соединение, таймаут, 5xx, 429
+    Ошибки из-за запроса (нет серии или перевода, пустая выдача, неожиданный ответ плеера) — не отказ
+    """
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, OSError)):
+        return True
+    # Shikimori: 429 и 520 — отдельные исключения
+    if isinstance(error, parser_errors.TooManyRequests):
+        return True
+    if isinstance(error, parser_errors.ServiceIsOverloaded):
+        return True
+    if isinstance(error, parser_errors.ServiceError):
+        status = _error_status(error)
+        return status is not None and (status >= 500 or status == 429)
+    return False
+
+
+def _poll_kodik_breaker() -> None:
+    """
+    В режиме auto, пока каталог отдаётся из локальных данных, в Kodik никто не ходит —
+    breaker двигают фоновые циклы: после open_seconds он переходит в half_open и
+    _on_kodik_half_open отправляет пробный запрос (успех — выход из деградированного режима)
+    """
+    if OFFLINE_MODE == "auto":
+        _kodik_breaker.poll()
+
+
+def _freeze(value: Any) -> Any:
+    """Делает аргументы хешируемыми для ключа single-flight"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+async def _single_flight(func, *args, **kwargs) -> Any:
+    """
+    Вызов метода парсера с объединением одинаковых одновременных запросов
+    Ключ — имя метода + аргументы
+    ✅ Запрос идёт через circuit breaker своего upstream (каталог Kodik/плеер Kodik/Shikimori)
+    ✅ Отказом считаются только соединение, таймаут, 5xx и 429
+    """
+    key = (getattr(func, "__qualname__", repr(func)), _freeze(args), _freeze(kwargs))
+
+    owner = getattr(func, "__self__", None)
+    if isinstance(owner, ShikimoriParserAsync):
+        breaker, timeout, pool = _shikimori_breaker, SHIKIMORI_TIMEOUT, _shikimori_pool
+    else:
+        breaker, timeout, pool = _kodik_breaker, KODIK_TIMEOUT, _kodik_pool
+        if getattr(func, "__name__", None) == "get_link":
+            breaker = _kodik_player_breaker
+
+    # get_list обходит несколько страниц подряд — время растёт пропорционально
+    timeout *= max(1, kwargs.get("pages_to_parse", 1))
+
+    # Очередь лимитера частоты — задержка на нашей стороне, а не медленный upstream
+    wait = LimiterWait()
+
+    async def call() -> Any:
+        # Загрузка экземпляра для выбора least_busy
+        pool.started(owner)
+        try:
+            with tracking_limiter_wait(wait):
+                return await func(*args, **kwargs)
+        finally:
+            pool.finished(owner)
+
+    return await _flight.do(key, lambda: breaker.call(
+        call,
+        timeout=timeout,
+        slow_after=timeout * UPSTREAM_SLOW_FRACTION,
+        ignore=(parser_errors.NoResults,),
+        is_failure=_is_upstream_failure,
+        paused=wait
+    ))
+
+
+# ═══════════════════════════════════════════
+# ФОНОВАЯ ЗАПИСЬ В ЛОКАЛЬНОЕ ХРАНИЛИЩЕ
+# ═══════════════════════════════════════════
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks: set = set()
+
+
+def _run_in_background(coro) -> None:
+    """Запускает корутину, не дожидаясь её"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _store_in_background(func, *args) -> None:
+    """Запускает синхронную запись в БД в отдельном потоке, не дожидаясь её"""
+    _run_in_background(asyncio.to_thread(func, *args))
+
+
 # ═══════════════════════════════════════════
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ═══════════════════════════════════════════
@@ -104,6 +498,63 @@ def create_search_variants(text: str) -> List[str]:
     return variants
 
 
+# Раскладка клавиатуры: одна и та же клавиша в EN и RU
+_EN_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+_RU_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбю"
+_EN_TO_RU_LAYOUT = str.maketrans(_EN_KEYS, _RU_KEYS)
+_RU_TO_EN_LAYOUT = str.maketrans(_RU_KEYS, _EN_KEYS)
+
+# Транслитерация латиница → кириллица (сначала длинные сочетания)
+_LATIN_TO_CYRILLIC = [
+    ("shch", "щ"), ("sch", "щ"),
+    ("tsu", "цу"), ("shi", "си"), ("chi", "ти"),
+    ("zh", "ж"), ("kh", "х"), ("ts", "ц"), ("ch", "ч"), ("sh", "ш"),
+    ("yo", "ё"), ("yu", "ю"), ("ya", "я"), ("ye", "е"), ("ou", "о"),
+    ("a", "а"), ("b", "б"), ("c", "к"), ("d", "д"), ("e", "е"), ("f", "ф"),
+    ("g", "г"), ("h", "х"), ("i", "и"), ("j", "дж"), ("k", "к"), ("l", "л"),
+    ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("q", "к"), ("r", "р"),
+    ("s", "с"), ("t", "т"), ("u", "у"), ("v", "в"), ("w", "в"), ("x", "кс"),
+    ("y", "й"), ("z", "з"),
+]
+_LATIN_TO_CYRILLIC_RE = re.compile("|".join(latin for latin, _ in _LATIN_TO_CYRILLIC))
+_LATIN_TO_CYRILLIC_MAP = dict(_LATIN_TO_CYRILLIC)
+
+# Транслитерация кириллица → латиница
+_CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+
+
+def create_spelling_variants(text: str) -> List[str]:
+    """
+    Варианты написания запроса (первым — исходный):
+    - набран не в той раскладке: "yfhenj" → "наруто", "тфкгещ" → "naruto"
+    - транслитерация: "naruto" → "наруто", "наруто" → "naruto"
+    """
+    raw = text.strip().lower()
+    candidates = [raw]
+
+    if re.search(r"[a-z]", raw):
+        candidates.append(raw.translate(_EN_TO_RU_LAYOUT))
+        candidates.append(_LATIN_TO_CYRILLIC_RE.sub(
+            lambda m: _LATIN_TO_CYRILLIC_MAP[m.group(0)], raw
+        ))
+    if re.search(r"[а-яё]", raw):
+        candidates.append(raw.translate(_RU_TO_EN_LAYOUT))
+        candidates.append(raw.translate(_CYRILLIC_TO_LATIN))
+
+    variants = []
+    for candidate in candidates:
+        normalized = normalize_search_text(candidate)
+        if normalized and normalized not in variants:
+            variants.append(normalized)
+    return variants
+
+
 # ═══════════════════════════════════════════
 # 🖼️ ПОЛУЧЕНИЕ ПОСТЕРА ИЗ SHIKIMORI
 # ═══════════════════════════════════════════
@@ -111,6 +562,7 @@ def create_search_variants(text: str) -> List[str]:
 async def get_poster_from_shikimori(shikimori_id: str) -> Optional[str]:
     """
     Получает постер аниме из Shikimori API
+    ✅ Сначала смотрит в кеш постеров (включая негативный кеш)
     
     Args:
         shikimori_id: ID аниме (с или без префикса 'z')
@@ -121,67 +573,695 @@ async def get_poster_from_shikimori(shikimori_id: str) -> Optional[str]:
     clean_id = get_clean_shikimori_id(shikimori_id)
     if not clean_id:
         return None
-    
+
+    cached = _poster_cache.get(clean_id)
+    if cached is not MISSING:
+        return cached
+
+    # ✅ Постер из локального хранилища (переживает рестарты)
+    offline = is_offline()
+    sid = normalize_shikimori_id(clean_id)
+    stored = await asyncio.to_thread(
+        anime_store.get_posters, [sid], None if offline else ANIME_STORE_POSTER_MAX_AGE
+    )
+    if sid in stored:
+        _poster_cache.set(clean_id, stored[sid])
+        return stored[sid]
+
+    if offline:
+        return None
+
+    poster = await _fetch_poster_from_shikimori(clean_id)
+    # Хранилище — только для найденных постеров: "нет в Shikimori" живёт лишь
+    # в негативном кеше, иначе оно считалось бы свежим ANIME_STORE_POSTER_MAX_AGE
+    if poster is not None and clean_id in _poster_cache:
+        _store_in_background(anime_store.save_posters, {sid: poster})
+    return poster
+
+
+async def _fetch_poster_from_shikimori(clean_id: str) -> Optional[str]:
+    """Запрос постера в Shikimori в обход кеша, результат кладётся в кеш"""
     try:
         parser = await get_shikimori_parser()
         
         # Используем deep_anime_info для получения постера
-        info = await parser.deep_anime_info(
+        info = await _single_flight(
+            parser.deep_anime_info,
             shikimori_id=clean_id,
             return_parameters=['poster { originalUrl }']
         )
         
+        poster = None
         if info and 'poster' in info:
             poster_data = info['poster']
             if isinstance(poster_data, dict):
-                return poster_data.get('originalUrl')
-            return poster_data
+                poster = poster_data.get('originalUrl')
+            else:
+                poster = poster_data
         
+        _poster_cache.set(clean_id, poster)
+        return poster
+
+    except parser_errors.NoResults:
+        # Аниме нет в Shikimori — кешируем ненадолго, чтобы не переспрашивать
+        _poster_cache.set(clean_id, None)
         return None
+
+    except CircuitOpenError:
+        return await _get_stale_poster(clean_id)
         
     except Exception as e:
         print(f"[SHIKIMORI POSTER ERROR] {e}")
-        return None
+        return await _get_stale_poster(clean_id)
 
 
-async def get_posters_batch(shikimori_ids: List[str]) -> Dict[str, Optional[str]]:
+async def _get_stale_poster(clean_id: str) -> Optional[str]:
+    """Постер из локального хранилища любой давности (Shikimori недоступен)"""
+    sid = normalize_shikimori_id(clean_id)
+    stored = await asyncio.to_thread(anime_store.get_posters, [sid], None)
+    return stored.get(sid)
+
+
+async def _fetch_posters_chunk(clean_ids: List[str]) -> Dict[str, Optional[str]]:
     """
-    Получает постеры для нескольких аниме (пакетный запрос)
-    
-    Args:
-        shikimori_ids: Список ID аниме
-    
+    Один GraphQL запрос animes(ids: ...) на пачку ID (в обход кеша)
+
     Returns:
-        Словарь {shikimori_id: poster_url}
+        Словарь {clean_id: poster_url} для всех ID пачки (None — нет в Shikimori)
     """
+    parser = await get_shikimori_parser()
+
+    animes = await _single_flight(
+        parser.deep_search,
+        title="",
+        search_parameters={
+            "ids": ",".join(clean_ids),
+            "limit": len(clean_ids)
+        },
+        return_parameters=['id', 'poster { originalUrl }']
+    )
+
+    found: Dict[str, Optional[str]] = {}
+    for anime in animes or []:
+        poster_data = anime.get('poster')
+        if isinstance(poster_data, dict):
+            poster_data = poster_data.get('originalUrl')
+        found[str(anime.get('id'))] = poster_data
+
+    # Всё, чего нет в ответе — в Shikimori отсутствует (уходит в негативный кеш)
+    posters = {cid: found.get(cid) for cid in clean_ids}
+    for cid, poster in posters.items():
+        _poster_cache.set(cid, poster)
+
+    return posters
+
+
+async def _get_posters_one_by_one(shikimori_ids: List[str]) -> Dict[str, Optional[str]]:
+    """Запасной путь: отдельный deep_anime_info на каждый ID"""
     results = {}
-    
+
     # Ограничиваем параллельные запросы чтобы не перегрузить Shikimori
     semaphore = asyncio.Semaphore(5)
     
     async def fetch_poster(sid: str):
+        # Темп запросов задаёт общий лимитер хоста Shikimori (parsers/http_client.py)
         async with semaphore:
-            # Добавляем небольшую задержку между запросами
-            await asyncio.sleep(0.2)
-            poster = await get_poster_from_shikimori(sid)
+            poster = await _fetch_poster_from_shikimori(get_clean_shikimori_id(sid))
             results[sid] = poster
     
-    tasks = [fetch_poster(sid) for sid in shikimori_ids if sid]
+    tasks = [fetch_poster(sid) for sid in shikimori_ids]
     await asyncio.gather(*tasks, return_exceptions=True)
+
+    return results
+
+
+async def get_posters_batch(shikimori_ids: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Получает постеры для нескольких аниме (пакетный запрос)
+    ✅ Кеш → один GraphQL запрос на пачку ID → поштучный запрос как fallback
+    
+    Args:
+        shikimori_ids: Список ID аниме
+    
+    Returns:
+        Словарь {shikimori_id: poster_url}
+    """
+    results = {}
+    missing_ids = []
+
+    # ✅ Сначала отдаём всё, что уже есть в кеше
+    for sid in shikimori_ids:
+        if not sid:
+            continue
+        cached = _poster_cache.get(get_clean_shikimori_id(sid))
+        if cached is MISSING:
+            missing_ids.append(sid)
+        else:
+            results[sid] = cached
+
+    if not missing_ids:
+        return results
+
+    # ✅ Затем локальное хранилище (в деградированном режиме — любой давности и без Shikimori)
+    offline = is_offline()
+    stored = await asyncio.to_thread(
+        anime_store.get_posters,
+        [normalize_shikimori_id(sid) for sid in missing_ids],
+        None if offline else ANIME_STORE_POSTER_MAX_AGE
+    )
+    if stored:
+        still_missing = []
+        for sid in missing_ids:
+            stored_sid = normalize_shikimori_id(sid)
+            if stored_sid in stored:
+                _poster_cache.set(get_clean_shikimori_id(sid), stored[stored_sid])
+                results[sid] = stored[stored_sid]
+            else:
+                still_missing.append(sid)
+        missing_ids = still_missing
+
+    if not missing_ids or offline:
+        return results
+
+    # clean_id → исходные ID запроса (z123 и 123 — одно аниме)
+    by_clean_id: Dict[str, List[str]] = {}
+    for sid in missing_ids:
+        by_clean_id.setdefault(get_clean_shikimori_id(sid), []).append(sid)
+
+    clean_ids = list(by_clean_id.keys())
+    chunks = [
+        clean_ids[i:i + POSTER_BATCH_SIZE]
+        for i in range(0, len(clean_ids), POSTER_BATCH_SIZE)
+    ]
+
+    chunk_results = await asyncio.gather(
+        *(_fetch_posters_chunk(chunk) for chunk in chunks),
+        return_exceptions=True
+    )
+
+    fallback_ids = []
+    fetched: Dict[str, Optional[str]] = {}
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, Exception):
+            print(f"[SHIKIMORI BATCH POSTER ERROR] {chunk_result}")
+            for cid in chunk:
+                fallback_ids.extend(by_clean_id[cid])
+            continue
+
+        for cid, poster in chunk_result.items():
+            # None ("нет в Shikimori") — только в негативный кеш, как и в поштучном пути
+            if poster is not None:
+                fetched[cid] = poster
+            for sid in by_clean_id[cid]:
+                results[sid] = poster
+
+    # ⚠️ Shikimori недоступен (breaker открыт) — поштучно не спрашиваем,
+    # берём постеры любой давности из локального хранилища
+    if fallback_ids and not _shikimori_breaker.is_closed:
+        stale = await asyncio.to_thread(
+            anime_store.get_posters,
+            [normalize_shikimori_id(sid) for sid in fallback_ids],
+            None
+        )
+        for sid in fallback_ids:
+            results[sid] = stale.get(normalize_shikimori_id(sid))
+        fallback_ids = []
+
+    # ⚠️ Пакетный запрос не прошёл — догружаем по одному
+    if fallback_ids:
+        fallback_results = await _get_posters_one_by_one(fallback_ids)
+        results.update(fallback_results)
+        for sid, poster in fallback_results.items():
+            if poster:
+                fetched[get_clean_shikimori_id(sid)] = poster
+
+    # 💾 Запоминаем в локальном хранилище
+    if fetched:
+        _store_in_background(
+            anime_store.save_posters,
+            {normalize_shikimori_id(cid): poster for cid, poster in fetched.items()}
+        )
     
     return results
 
 
+def get_parser_stats() -> Dict[str, Any]:
+    """Статистика кешей парсера"""
+    return {
+        "poster_cache": _poster_cache.stats(),
+        "breakers": {
+            "kodik": _kodik_breaker.stats(),
+            "kodik_player": _kodik_player_breaker.stats(),
+            "shikimori": _shikimori_breaker.stats()
+        },
+        "stale_cache": _last_good.stats(),
+        "offline_mode": {
+            "config": OFFLINE_MODE,
+            "active": is_offline()
+        },
+        "http_pool": get_http_pool_stats(),
+        "rate_limits": get_rate_limiter_stats(),
+        "parser_pools": {
+            "kodik": _kodik_pool.stats(),
+            "shikimori": _shikimori_pool.stats(),
+        },
+        "search_index": {
+            **_search_index.stats(),
+            "spelling_corrections": _spelling_corrections
+        },
+        "search_cache": {
+            **_search_cache.stats(),
+            "prefix_hits": _search_prefix_hits
+        },
+        "search_stream": _search_stream_stats_summary(),
+        "genre_index": _genre_index.stats(),
+        "store_reload": {
+            "high_water": _store_high_water.isoformat() if _store_high_water else None,
+            "reloaded": _store_reloaded,
+            "interval": STORE_RELOAD_INTERVAL
+        },
+        "catalog_index": _catalog_index.stats(),
+        "single_flight": _flight.stats(),
+        "catalog_snapshot": _catalog_snapshot_stats(),
+        "translations_cache": {
+            **_translations_cache.stats(),
+            "scheduled_refreshes": len(_translations_refreshes),
+            "refreshed_after_air": _translations_refreshed
+        },
+        "m3u8_cache": {
+            **_m3u8_cache.stats(),
+            "background_refreshes": _m3u8_background_refreshes
+        },
+        "next_episode_prefetch": {
+            "started": _prefetch_started,
+            "hits": _prefetch_hits,
+            "hit_rate": round(_prefetch_hits / _prefetch_started, 4) if _prefetch_started else 0.0,
+            "threshold": PREFETCH_PROGRESS_THRESHOLD
+        }
+    }
+
+
+# ─────────────────────────────────────────────
+# 🔤 ЛОКАЛЬНЫЙ ПОИСКОВЫЙ ИНДЕКС
+# ─────────────────────────────────────────────
+_search_index = SearchIndex(normalize_search_text)
+# Запросы, исправленные раскладкой/транслитерацией
+_spelling_corrections = 0
+
+# Индексация больших списков порциями, чтобы не блокировать event loop
+SEARCH_INDEX_CHUNK = 500
+
+# Самый новый updated_at хранилища, уже попавший в индексы
+_store_high_water: Optional[datetime] = None
+_store_reloaded = 0
+
+
+def _kodik_titles(item: Dict[str, Any]) -> List[str]:
+    """Все названия записи Kodik: русское, оригинальное и альтернативные"""
+    material = item.get("material_data") or {}
+    titles = [
+        item.get("title"),
+        item.get("title_orig"),
+        material.get("title"),
+        material.get("anime_title"),
+        material.get("title_en"),
+        material.get("title_orig"),
+    ]
+    titles.extend((item.get("other_title") or "").split(" / "))
+    for field in ("other_titles", "other_titles_en"):
+        titles.extend(material.get(field) or [])
+    return [title for title in titles if title]
+
+
+def _index_kodik_items(items: List[Dict[str, Any]]) -> None:
+    for item in items:
+        card = _genre_card(item)
+        if card and card.get("title"):
+            _search_index.add(card, _kodik_titles(item))
+            _catalog_index.add(card)
+
+
+async def _index_kodik_items_chunked(items: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(items), SEARCH_INDEX_CHUNK):
+        _index_kodik_items(items[start:start + SEARCH_INDEX_CHUNK])
+        await asyncio.sleep(0)
+
+
+def _remember_kodik_items(items: List[Dict[str, Any]]) -> None:
+    """Записи Kodik → локальное хранилище (в фоне) и поисковый индекс"""
+    _store_in_background(anime_store.save_kodik_items, items)
+    _index_kodik_items(items)
+
+
+def _kodik_item_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись хранилища в формате записи Kodik (material_data хранится целиком)"""
+    return {
+        "shikimori_id": record["shikimori_id"],
+        "title": record.get("title"),
+        "title_orig": record.get("title_orig"),
+        "year": record.get("year"),
+        "type": record.get("type"),
+        "screenshots": record.get("screenshots") or [],
+        "material_data": record.get("material_data") or {},
+    }
+
+
+def _store_updated_at(records: List[Dict[str, Any]]) -> Optional[datetime]:
+    return max((r["updated_at"] for r in records if r.get("updated_at")), default=None)
+
+
+async def _build_genre_index_from_records(records: List[Dict[str, Any]]) -> None:
+    """Жанровый индекс из записей хранилища (новые первыми, как в списке Kodik)"""
+    records = sorted(
+        records,
+        key=lambda r: r.get("updated_at") or datetime.min.replace(tzinfo=timezone.utc),
+        reverse=True
+    )
+    cards = [card for card in (_genre_card(_kodik_item_from_record(r)) for r in records) if card]
+    await asyncio.to_thread(_genre_index.build, cards)
+    print(f"🎭 Жанровый индекс из хранилища: {len(cards)} записей")
+
+
+async def load_search_index() -> None:
+    """Наполняет индексы всем, что уже есть в локальном хранилище (при старте)"""
+    global _store_high_water
+    records = await asyncio.to_thread(anime_store.get_catalog)
+    _store_high_water = _store_updated_at(records)
+    items = [_kodik_item_from_record(r) for r in records]
+    await _index_kodik_items_chunked(items)
+    print(f"🔤 Поисковый индекс: {len(_search_index)} аниме из хранилища")
+
+    # Жанровый индекс из хранилища — жанры работают до первого обхода Kodik и без него
+    if items and not _genre_index.ready:
+        await _build_genre_index_from_records(records)
+
+
+async def reload_from_store() -> int:
+    """
+    Подхватывает записи, обновлённые в хранилище после прошлой загрузки
+    (их пишет воркер синхронизации каталога — отдельный процесс)
+
+    Returns:
+        Сколько записей проиндексировано
+    """
+    global _store_high_water, _store_reloaded
+    records = await asyncio.to_thread(anime_store.get_catalog, _store_high_water)
+    if _store_high_water is not None:
+        records = [r for r in records if r.get("updated_at") and r["updated_at"] > _store_high_water]
+    if not records:
+        return 0
+
+    _store_high_water = _store_updated_at(records) or _store_high_water
+    await _index_kodik_items_chunked([_kodik_item_from_record(r) for r in records])
+    _store_reloaded += len(records)
+
+    # Каталог синхронизирует воркер — жанровый индекс строится из хранилища, а не обходом Kodik
+    if await _catalog_sync_fresh():
+        await _build_genre_index_from_records(await asyncio.to_thread(anime_store.get_catalog))
+
+    return len(records)
+
+
+async def _catalog_sync_fresh() -> bool:
+    """Воркер синхронизации прошёл каталог целиком и запускался недавно"""
+    state = await asyncio.to_thread(anime_store.get_sync_state, CATALOG_SYNC_NAME)
+    last_run_at = state.get("last_run_at")
+    if state.get("phase") != "incremental" or last_run_at is None:
+        return False
+    if last_run_at.tzinfo is None:
+        last_run_at = last_run_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - last_run_at < timedelta(seconds=GENRE_INDEX_REFRESH_INTERVAL)
+
+
+async def _store_reload_loop() -> None:
+    while True:
+        await asyncio.sleep(STORE_RELOAD_INTERVAL)
+        try:
+            reloaded = await reload_from_store()
+            if reloaded:
+                print(f"📚 Из хранилища проиндексировано обновлённых аниме: {reloaded}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[STORE RELOAD ERROR] {e}")
+
+
+def _search_local(query: str, limit: int) -> List[Dict[str, Any]]:
+    """Карточки из локального индекса (без постеров) с оценкой в _relevance"""
+    results = []
+    for shiki_id, score in _search_index.search(query, limit=limit, min_score=SEARCH_INDEX_MIN_SCORE):
+        card = _search_index.card(shiki_id)
+        card["_relevance"] = score
+        results.append(card)
+    return results
+
+
+def _best_spelling(title: str) -> str:
+    """
+    Вариант написания с лучшим совпадением в локальном индексе
+    Исходный запрос остаётся, если другой вариант не лучше его заметно
+    """
+    global _spelling_corrections
+
+    variants = create_spelling_variants(title)
+    if not variants:
+        return normalize_search_text(title)
+
+    def top_score(variant: str) -> float:
+        hits = _search_index.search(variant, limit=1, min_score=SEARCH_INDEX_MIN_SCORE)
+        return hits[0][1] if hits else 0.0
+
+    best, best_score = variants[0], top_score(variants[0])
+    for variant in variants[1:]:
+        score = top_score(variant)
+        if score > best_score + SPELLING_MIN_GAIN:
+            best, best_score = variant, score
+
+    if best != variants[0]:
+        _spelling_corrections += 1
+        print(f"⌨️ Запрос '{title}' исправлен на '{best}'")
+    return best
+
+
+def suggest_titles(prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Автодополнение по началу названия (только данные в памяти, без запросов к upstream)
+    Постер — из кеша постеров, иначе первый скриншот
+    """
+    suggestions = []
+    for shiki_id in _search_index.suggest(prefix, limit):
+        card = _search_index.card(shiki_id)
+        poster = _poster_cache.peek(get_clean_shikimori_id(shiki_id))
+        if poster is MISSING or not poster:
+            screenshots = card.get("screenshots") or []
+            poster = screenshots[0] if screenshots else None
+        suggestions.append({
+            "id": shiki_id,
+            "title": card.get("title"),
+            "title_orig": card.get("title_orig"),
+            "year": card.get("year"),
+            "type": card.get("type"),
+            "poster": poster
+        })
+    return suggestions
+
+
 # ─────────────────────────────────────────────
 # 🔍 ПОИСК АНИМЕ
 # ─────────────────────────────────────────────
+def _cancel_pending(tasks: List[asyncio.Task]) -> None:
+    """Отменяет незавершённые задачи, у завершённых забирает исключение (без warning в логах)"""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+
+def _search_cache_key(title: str) -> str:
+    return normalize_search_text(title).lower()
+
+
+def _filter_search_results(results: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """Оставляет результаты, в названии которых есть все слова запроса"""
+    words = query.split()
+    filtered = []
+    for item in results:
+        haystack = " ".join(
+            normalize_search_text(item.get(field) or "").lower()
+            for field in ("title", "title_orig")
+        )
+        if all(word in haystack for word in words):
+            filtered.append(item)
+    return filtered
+
+
+def _get_cached_search(query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Ответ из кеша поиска:
+    1. тот же запрос с limit >= запрошенного (или полный ответ — все совпадения в Kodik)
+    2. запрос — продолжение закешированного полного ответа ("нару" → "наруто"):
+       результаты фильтруются локально
+    Полный ответ — выдача Kodik не упёрлась в лимит запроса и ничего не отброшено по limit;
+    иначе отфильтрованный по релевантности срез не содержит всех совпадений
+    """
+    cached = _search_cache.get(query)
+    if cached is not MISSING:
+        cached_limit, results, complete = cached
+        if cached_limit >= limit or complete:
+            return [dict(r) for r in results[:limit]]
+
+    # Более короткий запрос с полным ответом содержит все совпадения длинного
+    for end in range(len(query) - 1, SEARCH_CACHE_MIN_PREFIX - 1, -1):
+        prefix_cached = _search_cache.peek(query[:end])
+        if prefix_cached is MISSING:
+            continue
+        _, results, complete = prefix_cached
+        if not complete:
+            continue
+        filtered = _filter_search_results(results, query)
+        if filtered:
+            global _search_prefix_hits
+            _search_prefix_hits += 1
+            return [dict(r) for r in filtered[:limit]]
+
+    return None
+
+
 async def search_anime(title: str, limit: int = 12) -> List[Dict[str, Any]]:
     """
     Поиск аниме с группировкой по shikimori_id
+    ✅ Кеш по нормализованному запросу (TTL + LRU + лимит по памяти)
+    ✅ limit хороших совпадений в локальном триграммном индексе — без запросов к Kodik
+    ✅ Исправление раскладки клавиатуры и транслитерации по локальному индексу
+    ✅ В деградированном режиме — только локальный индекс (stale)
     ✅ Постеры загружаются из Shikimori
     ✅ Умный поиск с вариантами запроса
     """
-    parser = await get_kodik_parser()
+    query = _search_cache_key(title)
+
+    cached = _get_cached_search(query, limit)
+    if cached is not None:
+        print(f"⚡ Поиск '{title}' из кеша: {len(cached)} результатов")
+        return cached
+
+    candidates, offline, complete = await _search_candidates(title, limit)
+
+    if offline:
+        # Деградированный режим: только локальный индекс, без кеширования
+        return _mark_stale(await _finish_search_results(candidates, limit))
+
+    if candidates is None:
+        return _stale_search(query, limit)
+
+    results = await _finish_search_results(candidates, limit)
+    _cache_search(query, limit, results, complete)
+    return [dict(r) for r in results]
+
+
+async def _search_candidates(title: str, limit: int) -> Tuple[Optional[List[Dict[str, Any]]], bool, bool]:
+    """
+    Ранжированные карточки без постеров (с _relevance и скриншотами)
+
+    Returns:
+        (карточки или None при ошибке Kodik, деградированный режим, полный ли ответ)
+    """
+    # Не та раскладка или транслит — в индекс и Kodik уходит лучший вариант написания
+    spelling = _best_spelling(title)
+
+    if is_offline():
+        return _rank_search_results(_search_local(spelling, limit), limit), True, False
+
+    local = _search_local(spelling, limit)
+    # Kodik не нужен, только если индекс сам набрал limit хороших совпадений,
+    # иначе в Kodik могут быть аниме, которых ещё нет в индексе
+    good = [card for card in local if card["_relevance"] >= SEARCH_INDEX_GOOD_SCORE]
+    if len(good) >= limit:
+        print(f"🔤 Поиск '{title}' из локального индекса: {len(local)} результатов")
+        return _rank_search_results(local, limit), False, False
+
+    found = await _search_kodik(spelling, limit, local)
+    if found is None:
+        return None, False, False
+    return found[0], False, found[1]
+
+
+def _stale_search(query: str, limit: int) -> List[Dict[str, Any]]:
+    """Kodik недоступен — последний удачный ответ с пометкой stale"""
+    stale = _last_good.get(("search", query))
+    return _mark_stale(stale[:limit]) if stale is not MISSING else []
+
+
+def _cache_search(query: str, limit: int, results: List[Dict[str, Any]], complete: bool) -> None:
+    _search_cache.set(
+        query,
+        (limit, results, complete),
+        ttl=None if results else SEARCH_CACHE_EMPTY_TTL
+    )
+    if results:
+        _last_good.set(("search", query), results)
+
+
+def _rank_search_results(candidates: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Сортирует по релевантности и обрезает до limit"""
+    return sorted(
+        candidates,
+        key=lambda x: x.get("_relevance", 0),
+        reverse=True
+    )[:limit]
+
+
+def _search_poster(card: Dict[str, Any], poster: Optional[str]) -> Optional[str]:
+    """Постер из Shikimori, fallback — первый скриншот"""
+    if not poster and card.get("screenshots"):
+        return card["screenshots"][0]
+    return poster
+
+
+def _strip_search_fields(results: List[Dict[str, Any]]) -> None:
+    """Убирает служебные поля"""
+    for r in results:
+        r.pop("_relevance", None)
+        r.pop("screenshots", None)
+
+
+async def _finish_search_results(candidates: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Сортирует по релевантности, обрезает до limit и проставляет постеры"""
+    sorted_results = _rank_search_results(candidates, limit)
+
+    # ✅ Загружаем постеры из Shikimori
+    if sorted_results:
+        print(f"🖼️ Загружаем постеры из Shikimori для {len(sorted_results)} аниме...")
+        posters = await get_posters_batch([r["id"] for r in sorted_results])
+
+        for r in sorted_results:
+            r["poster"] = _search_poster(r, posters.get(r["id"]))
+
+    _strip_search_fields(sorted_results)
+    return sorted_results
+
+
+async def _search_kodik(
+    title: str,
+    limit: int,
+    local: Optional[List[Dict[str, Any]]] = None
+) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+    """
+    Поиск в Kodik по всем вариантам запроса
+    Найденное попадает в локальный индекс, релевантность — оценка индекса;
+    слабые локальные совпадения (local) объединяются с выдачей Kodik
+
+    Returns:
+        (ранжированные карточки без постеров, полный ли ответ) или None при ошибке
+        (ошибки не кешируются)
+    """
+    try:
+        parser = await get_kodik_parser()
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        print(f"[KODIK SEARCH ERROR] {e}")
+        return None
 
     # Создаём варианты поискового запроса
     search_variants = create_search_variants(title)
@@ -189,27 +1269,42 @@ async def search_anime(title: str, limit: int = 12) -> List[Dict[str, Any]]:
     print(f"🔍 Ищем: '{title}' → варианты: {search_variants}")
 
     grouped: Dict[str, Dict] = {}
-    search_words = set(normalized_title.lower().split())
-    
-    # Также создаём слитный вариант для сравнения
-    search_joined = normalized_title.lower().replace(" ", "").replace("-", "")
+    fetch_limit = limit * SEARCH_KODIK_OVERFETCH
+    # Какой-то вариант не разобран или упёрся в fetch_limit — в Kodik могут быть ещё совпадения
+    truncated = False
+
+    # ✅ Все варианты уходят в Kodik одновременно
+    variant_tasks = [
+        asyncio.create_task(_single_flight(
+            parser.search,
+            title=variant,
+            limit=fetch_limit,
+            only_anime=True,
+            include_material_data=True,
+            strict=False
+        ))
+        for variant in search_variants
+    ]
+
+    failed_variants = 0
 
     try:
-        # Ищем по всем вариантам запроса
-        for variant in search_variants:
+        # Результаты разбираем в порядке приоритета вариантов
+        for variant, variant_task in zip(search_variants, variant_tasks):
             if len(grouped) >= limit:
+                truncated = True
                 break
                 
             try:
-                results = await parser.search(
-                    title=variant,
-                    limit=limit * 15,
-                    only_anime=True,
-                    include_material_data=True,
-                    strict=False
-                )
+                results = await variant_task
+                if len(results) >= fetch_limit:
+                    truncated = True
                 
                 print(f"📊 Вариант '{variant}': Kodik вернул {len(results)} результатов")
+                _remember_kodik_items(results)
+
+                # Релевантность — триграммная оценка названий (включая альтернативные)
+                scores = _search_index.scores(normalized_title)
 
                 for item in results:
                     shiki_id = normalize_shikimori_id(item.get("shikimori_id"))
@@ -219,153 +1314,402 @@ async def search_anime(title: str, limit: int = 12) -> List[Dict[str, Any]]:
                     if shiki_id in grouped:
                         continue
 
-                    material = item.get("material_data") or {}
                     title_ru = item.get("title", "")
-                    title_orig = material.get("title_orig", "")
-                    
                     if not title_ru or len(title_ru) < 2:
                         continue
 
-                    # Проверяем релевантность
-                    normalized_anime_title = normalize_search_text(title_ru)
-                    anime_words = set(normalized_anime_title.lower().split())
-                    
-                    if title_orig:
-                        normalized_orig_title = normalize_search_text(title_orig)
-                        anime_words.update(normalized_orig_title.lower().split())
-                    
-                    # Слитный вариант названия для сравнения
-                    anime_title_joined = normalized_anime_title.lower().replace(" ", "").replace("-", "")
-                    
-                    matching_words = search_words.intersection(anime_words)
-                    relevance_ratio = len(matching_words) / len(search_words) if search_words else 0
-                    
-                    is_relevant = (
-                        relevance_ratio >= 0.4 or
-                        normalized_title.lower() in normalized_anime_title.lower() or
-                        normalized_anime_title.lower() in normalized_title.lower() or
-                        search_joined in anime_title_joined or
-                        anime_title_joined in search_joined
-                    )
-                    
-                    if not is_relevant:
+                    relevance = scores.get(shiki_id, 0.0)
+                    if relevance < SEARCH_INDEX_MIN_SCORE:
                         continue
 
-                    grouped[shiki_id] = {
-                        "id": shiki_id,
-                        "title": title_ru,
-                        "title_orig": title_orig,
-                        "year": item.get("year"),
-                        "type": item.get("type"),
-                        "poster": None,
-                        "screenshots": item.get("screenshots", []),
-                        "description": material.get("description"),
-                        "genres": material.get("genres", []),
-                        "status": material.get("status"),
-                        "rating": material.get("shikimori_rating"),
-                        "_relevance": relevance_ratio
-                    }
-
-                    if len(grouped) >= limit:
-                        break
+                    grouped[shiki_id] = {**_genre_card(item), "_relevance": relevance}
                         
+            except parser_errors.NoResults:
+                failed_variants += 1
+                continue
+
+            except CircuitOpenError:
+                failed_variants += 1
+                truncated = True
+                continue
+
             except Exception as e:
                 print(f"⚠️ Ошибка поиска варианта '{variant}': {e}")
+                failed_variants += 1
+                truncated = True
                 continue
 
-        # ✅ Загружаем постеры из Shikimori
-        if grouped:
-            print(f"🖼️ Загружаем постеры из Shikimori для {len(grouped)} аниме...")
-            posters = await get_posters_batch(list(grouped.keys()))
-            
-            for shiki_id, poster_url in posters.items():
-                if shiki_id in grouped:
-                    grouped[shiki_id]["poster"] = poster_url
-                    # Fallback на скриншот если постер не найден
-                    if not poster_url and grouped[shiki_id]["screenshots"]:
-                        grouped[shiki_id]["poster"] = grouped[shiki_id]["screenshots"][0]
-
-        # Сортируем по релевантности
-        sorted_results = sorted(
-            grouped.values(),
-            key=lambda x: x.get("_relevance", 0),
-            reverse=True
-        )
-        
-        # Убираем служебные поля
-        for r in sorted_results:
-            r.pop("_relevance", None)
-            r.pop("screenshots", None)
-        
+        # Набрали limit — оставшиеся варианты больше не нужны
+        _cancel_pending(variant_tasks)
+
+        # Все варианты упали — это ошибка Kodik, а не пустая выдача
+        if failed_variants and failed_variants == len(search_variants) and not grouped:
+            return None
+
+        # Объединяем с локальными совпадениями, которых Kodik не вернул
+        for card in local or []:
+            grouped.setdefault(card["id"], card)
+
+        complete = not truncated and len(local or []) < limit and len(grouped) <= limit
+        sorted_results = _rank_search_results(list(grouped.values()), limit)
         print(f"✅ Итого найдено: {len(sorted_results)} релевантных результатов")
 
-        return sorted_results[:limit]
+        return sorted_results, complete
 
     except Exception as e:
         print(f"[KODIK SEARCH ERROR] {e}")
-        return []
+        _cancel_pending(variant_tasks)
+        return None
+
+
+# ─────────────────────────────────────────────
+# 📡 ПОТОКОВЫЙ ПОИСК
+# ─────────────────────────────────────────────
+# Время до результатов (без постеров) и общее время потокового поиска, секунды
+_search_stream_stats = {"streams": 0, "ttfb": 0.0, "total": 0.0}
+
+
+async def search_anime_stream(title: str, limit: int = 12) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Поиск аниме событиями по мере готовности (тот же пайплайн, что у search_anime)
+    ✅ {"event": "results"} — сгруппированные результаты сразу после ответа Kodik/индекса;
+       постеры из кеша уже проставлены, остальные — null
+    ✅ {"event": "posters"} — патчи {id: poster} по мере ответа Shikimori
+    ✅ {"event": "done"} — время до результатов (ttfb_ms) и общее время (total_ms)
+    ✅ Итог кешируется как обычный поиск
+    """
+    started = time.perf_counter()
+    query = _search_cache_key(title)
+
+    pending: List[str] = []
+    fallbacks: Dict[str, Optional[str]] = {}
+    stale = False
+    cacheable = complete = False
+
+    results = _get_cached_search(query, limit)
+    if results is None:
+        candidates, offline, complete = await _search_candidates(title, limit)
+        if candidates is None:
+            results, stale = _stale_search(query, limit), True
+        else:
+            results, stale, cacheable = candidates, offline, not offline
+            for card in results:
+                fallbacks[card["id"]] = _search_poster(card, None)
+                poster = _poster_cache.get(get_clean_shikimori_id(card["id"]))
+                if poster is MISSING:
+                    card["poster"] = None
+                    pending.append(card["id"])
+                else:
+                    card["poster"] = poster or fallbacks[card["id"]]
+            _strip_search_fields(results)
+            if stale:
+                results = _mark_stale(results)
+
+    ttfb = time.perf_counter() - started
+    yield {
+        "event": "results",
+        "query": title,
+        "count": len(results),
+        "results": [dict(r) for r in results],
+        "stale": stale
+    }
+
+    if pending:
+        by_id = {r["id"]: r for r in results}
+
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Optional[str]]:
+            try:
+                posters = await get_posters_batch(chunk)
+            except Exception as e:
+                print(f"[SEARCH STREAM POSTER ERROR] {e}")
+                posters = {}
+            return {sid: posters.get(sid) or fallbacks.get(sid) for sid in chunk}
+
+        chunks = [
+            pending[i:i + SEARCH_STREAM_POSTER_CHUNK]
+            for i in range(0, len(pending), SEARCH_STREAM_POSTER_CHUNK)
+        ]
+        # Пачки постеров уходят одновременно, патчи — в порядке ответов
+        for chunk_task in asyncio.as_completed([fetch_chunk(chunk) for chunk in chunks]):
+            patch = await chunk_task
+            for sid, poster in patch.items():
+                by_id[sid]["poster"] = poster
+            yield {"event": "posters", "posters": patch}
+
+    if cacheable:
+        _cache_search(query, limit, results, complete)
+
+    total = time.perf_counter() - started
+    _search_stream_stats["streams"] += 1
+    _search_stream_stats["ttfb"] += ttfb
+    _search_stream_stats["total"] += total
+
+    yield {
+        "event": "done",
+        "ttfb_ms": round(ttfb * 1000, 1),
+        "total_ms": round(total * 1000, 1)
+    }
+
+
+def _search_stream_stats_summary() -> Dict[str, Any]:
+    streams = _search_stream_stats["streams"]
+    return {
+        "streams": streams,
+        "avg_ttfb_ms": round(_search_stream_stats["ttfb"] / streams * 1000, 1) if streams else 0.0,
+        "avg_total_ms": round(_search_stream_stats["total"] / streams * 1000, 1) if streams else 0.0,
+    }
 
 
 # ─────────────────────────────────────────────
 # 📄 ИНФОРМАЦИЯ ОБ АНИМЕ
 # ─────────────────────────────────────────────
+def _details_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Собирает ответ get_anime_details из записи локального хранилища"""
+    material = record.get("material_data") or {}
+    screenshots = record.get("screenshots") or []
+
+    poster = record.get("poster")
+    if not poster and screenshots:
+        poster = screenshots[0]
+
+    return {
+        "id": record["shikimori_id"],
+        "title": record.get("title"),
+        "title_orig": record.get("title_orig"),
+        "description": material.get("description"),
+        "genres": record.get("genres") or [],
+        "type": record.get("type"),
+        "status": record.get("status"),
+        "episodes_count": material.get("episodes_total"),
+        "episodes_aired": material.get("episodes_aired"),
+        "series_count": record.get("series_count") or 1,
+        "year": record.get("year"),
+        "rating": record.get("rating"),
+        "poster": poster,
+        "screenshots": screenshots,
+        "translations": record.get("translations") or [],
+        "next_episode_at": material.get("next_episode_at"),
+        "duration": material.get("duration")
+    }
+
+
+def _parse_iso_time(value: Any) -> Optional[float]:
+    """ISO-время Kodik ("2024-05-12T15:00:00Z") → unix time"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _translations_expire_at(material: Dict[str, Any], updated_at: float) -> float:
+    """
+    До какого момента список переводов считается актуальным
+    - вышедшее аниме: TRANSLATIONS_RELEASED_TTL
+    - онгоинг: до выхода следующей серии (+ запас), но не дольше TRANSLATIONS_ONGOING_TTL
+    """
+    if material.get("status") == "released":
+        return updated_at + TRANSLATIONS_RELEASED_TTL
+
+    expire_at = updated_at + TRANSLATIONS_ONGOING_TTL
+    next_episode_at = _parse_iso_time(material.get("next_episode_at"))
+    if next_episode_at is not None and next_episode_at > updated_at:
+        expire_at = min(expire_at, next_episode_at + TRANSLATIONS_AIR_MARGIN)
+    return expire_at
+
+
+def _dedup_translations(translations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Убирает повторы по названию студии, популярные студии — первыми"""
+    seen_names = set()
+    unique_translations = []
+
+    for t in translations:
+        name = t.get("name", "").strip()
+        if name and name not in seen_names:
+            seen_names.add(name)
+            unique_translations.append(t)
+
+    popular_studios = ["AniLibria", "AniDUB", "Animedia", "AniStar"]
+    unique_translations.sort(
+        key=lambda x: (
+            popular_studios.index(x["name"]) if x["name"] in popular_studios else 999,
+            -int(x.get("id", 0))
+        )
+    )
+    return unique_translations
+
+
+def _cache_translations(
+    shiki_id: str,
+    matrix: Dict[str, Any],
+    material: Dict[str, Any],
+    updated_at: Optional[float] = None
+) -> None:
+    """
+    Кладёт переводы в кеш до момента их устаревания;
+    для онгоинга с известной датой серии планирует обновление сразу после выхода
+    """
+    now = time.time()
+    expire_at = _translations_expire_at(material, updated_at or now)
+    if expire_at <= now:
+        return
+    _translations_cache.set(shiki_id, matrix, ttl=expire_at - now)
+
+    next_episode_at = _parse_iso_time(material.get("next_episode_at"))
+    if material.get("status") != "released" and next_episode_at is not None and next_episode_at > now:
+        _schedule_translations_refresh(shiki_id, next_episode_at + TRANSLATIONS_AIR_MARGIN - now)
+
+
+def _schedule_translations_refresh(shiki_id: str, delay: float) -> None:
+    handle = _translations_refreshes.pop(shiki_id, None)
+    if handle is not None:
+        handle.cancel()
+    elif len(_translations_refreshes) >= TRANSLATIONS_MAX_SCHEDULED:
+        return
+
+    _translations_refreshes[shiki_id] = asyncio.get_running_loop().call_later(
+        delay, lambda: _run_in_background(_refresh_translations(shiki_id))
+    )
+
+
+async def _refresh_translations(shiki_id: str) -> None:
+    """Обновление переводов онгоинга после выхода серии (в фоне, до запроса пользователя)"""
+    global _translations_refreshed
+    _translations_refreshes.pop(shiki_id, None)
+    _translations_cache.pop(shiki_id)
+
+    try:
+        parser = await get_kodik_parser()
+        info, search_result = await asyncio.gather(
+            _single_flight(parser.get_info, id=shiki_id, id_type="shikimori"),
+            _single_flight(parser.search_by_id, id=shiki_id, id_type="shikimori", limit=1)
+        )
+    except Exception as e:
+        print(f"[TRANSLATIONS REFRESH ERROR] {shiki_id}: {e}")
+        return
+
+    if not search_result:
+        return
+
+    anime = search_result[0]
+    matrix = {
+        "translations": _dedup_translations(info.get("translations", [])),
+        "series_count": info.get("series_count", 1),
+    }
+    _cache_translations(shiki_id, matrix, anime.get("material_data") or {})
+    _store_in_background(
+        anime_store.save_details, shiki_id, matrix["translations"], matrix["series_count"], anime
+    )
+    _index_kodik_items([anime])
+    _translations_refreshed += 1
+    print(f"🔄 Переводы {shiki_id} обновлены после выхода серии")
+
+
 async def get_anime_details(shikimori_id: str) -> Optional[Dict[str, Any]]:
     """
     Получение детальной информации об аниме
+    ✅ Свежая запись из локального хранилища отдаётся без запросов к Kodik
+    ✅ Переводы кешируются: у вышедших — надолго, у онгоингов — до выхода серии
     ✅ Постер загружается из Shikimori
+    ✅ В деградированном режиме — запись хранилища любой давности (stale)
     """
-    parser = await get_kodik_parser()
     shiki_id = normalize_shikimori_id(shikimori_id)
 
     if not shiki_id:
         return None
 
+    if is_offline():
+        return await _stale_details(shiki_id)
+
+    stored = await asyncio.to_thread(
+        anime_store.get_records, [shiki_id], ANIME_STORE_MAX_AGE
+    )
+    record = stored.get(shiki_id)
+
+    matrix = _translations_cache.get(shiki_id)
+    if record and matrix is MISSING and record.get("translations") is not None:
+        details_updated_at = record.get("details_updated_at")
+        if details_updated_at is not None:
+            if details_updated_at.tzinfo is None:
+                details_updated_at = details_updated_at.replace(tzinfo=timezone.utc)
+            _cache_translations(
+                shiki_id,
+                {"translations": record["translations"], "series_count": record.get("series_count")},
+                record.get("material_data") or {},
+                details_updated_at.timestamp()
+            )
+            matrix = _translations_cache.get(shiki_id)
+
+    if record and matrix is not MISSING:
+        if record.get("poster_updated_at") is None:
+            record["poster"] = await get_poster_from_shikimori(shiki_id)
+        return _details_from_record({**record, **matrix})
+
     try:
-        # 1️⃣ Переводы и количество серий
-        info = await parser.get_info(
-            id=shiki_id,
-            id_type="shikimori"
-        )
+        parser = await get_kodik_parser()
 
-        # 2️⃣ Основные данные
-        search_result = await parser.search_by_id(
-            id=shiki_id,
-            id_type="shikimori",
-            limit=1
+        # Переводы, основные данные и постер независимы — запрашиваем параллельно
+        print(f"🖼️ Загружаем постер из Shikimori для {shiki_id}...")
+        info, search_result, poster = await asyncio.gather(
+            # 1️⃣ Переводы и количество серий (если их нет в кеше)
+            _single_flight(
+                parser.get_info,
+                id=shiki_id,
+                id_type="shikimori"
+            ) if matrix is MISSING else asyncio.sleep(0, matrix),
+            # 2️⃣ Основные данные
+            _single_flight(
+                parser.search_by_id,
+                id=shiki_id,
+                id_type="shikimori",
+                limit=1
+            ),
+            # 3️⃣ Постер из Shikimori
+            get_poster_from_shikimori(shiki_id),
+            return_exceptions=True
         )
 
+        # Без переводов или основных данных страницы нет — как и раньше
+        if isinstance(info, Exception):
+            raise info
+        if isinstance(search_result, Exception):
+            raise search_result
+
         if not search_result:
             return None
 
         anime = search_result[0]
         material = anime.get("material_data") or {}
 
-        # 3️⃣ Получаем постер из Shikimori
-        print(f"🖼️ Загружаем постер из Shikimori для {shiki_id}...")
-        poster = await get_poster_from_shikimori(shiki_id)
+        if isinstance(poster, Exception):
+            print(f"[SHIKIMORI POSTER ERROR] {poster}")
+            poster = None
         
         # Fallback на скриншот
         if not poster and anime.get("screenshots"):
             poster = anime["screenshots"][0]
 
         # Обработка переводов
-        translations = info.get("translations", [])
-        seen_names = set()
-        unique_translations = []
-        
-        for t in translations:
-            name = t.get("name", "").strip()
-            if name and name not in seen_names:
-                seen_names.add(name)
-                unique_translations.append(t)
-
-        popular_studios = ["AniLibria", "AniDUB", "Animedia", "AniStar"]
-        unique_translations.sort(
-            key=lambda x: (
-                popular_studios.index(x["name"]) if x["name"] in popular_studios else 999,
-                -int(x.get("id", 0))
-            )
+        if matrix is MISSING:
+            matrix = {
+                "translations": _dedup_translations(info.get("translations", [])),
+                "series_count": info.get("series_count", 1),
+            }
+            _cache_translations(shiki_id, matrix, material)
+
+        # 💾 Запоминаем в локальном хранилище
+        _store_in_background(
+            anime_store.save_details,
+            shiki_id,
+            matrix["translations"],
+            matrix["series_count"],
+            anime
         )
+        _index_kodik_items([anime])
 
         return {
             "id": shiki_id,
@@ -377,112 +1721,541 @@ async def get_anime_details(shikimori_id: str) -> Optional[Dict[str, Any]]:
             "status": material.get("status"),
             "episodes_count": material.get("episodes_total"),
             "episodes_aired": material.get("episodes_aired"),
-            "series_count": info.get("series_count", 1),
+            "series_count": matrix["series_count"],
             "year": anime.get("year"),
             "rating": material.get("shikimori_rating"),
             "poster": poster,  # ✅ Постер из Shikimori
             "screenshots": anime.get("screenshots", []),
-            "translations": unique_translations,
+            "translations": matrix["translations"],
             "next_episode_at": material.get("next_episode_at"),
             "duration": material.get("duration")
         }
 
     except Exception as e:
-        print(f"[KODIK DETAILS ERROR] {e}")
+        if not isinstance(e, CircuitOpenError):
+            print(f"[KODIK DETAILS ERROR] {e}")
+
+        # Kodik недоступен — запись из локального хранилища любой давности
+        return await _stale_details(shiki_id)
+
+
+async def _stale_details(shiki_id: str) -> Optional[Dict[str, Any]]:
+    """Детали только из локальных данных (запись любой давности + кеш переводов), stale: true"""
+    stored = await asyncio.to_thread(anime_store.get_records, [shiki_id], None)
+    record = stored.get(shiki_id)
+    if record is None:
         return None
 
+    matrix = _translations_cache.get(shiki_id)
+    if matrix is not MISSING:
+        record = {**record, **matrix}
+    if record.get("poster_updated_at") is None:
+        record["poster"] = await get_poster_from_shikimori(shiki_id)
+    return {**_details_from_record(record), "stale": True}
+
+
+def _batch_card(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Карточка пакетного ответа (без переводов и скриншотов)"""
+    details = _details_from_record(record)
+    for field in ("translations", "screenshots", "series_count", "description"):
+        details.pop(field, None)
+    return details
+
+
+async def get_anime_batch(shikimori_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Карточки нескольких аниме (избранное, просмотренное, история)
+    ✅ Одно чтение локального хранилища на все ID
+    ✅ Промахи дозапрашиваются в Kodik одним параллельным заходом, постеры — одним пакетом Shikimori
+    ✅ Ошибка по одному ID не ломает весь ответ: {"id", "error"}
+
+    Returns:
+        Карточки в порядке запроса
+    """
+    ids: List[Optional[str]] = [normalize_shikimori_id(sid.strip()) if sid.strip() else None for sid in shikimori_ids]
+    unique_ids = list(dict.fromkeys(sid for sid in ids if sid))
+
+    records = await asyncio.to_thread(anime_store.get_records, unique_ids, ANIME_STORE_MAX_AGE)
+    errors: Dict[str, str] = {}
+    stale_ids = set()
+
+    misses = [sid for sid in unique_ids if sid not in records]
+    if misses and not is_offline():
+        try:
+            parser = await get_kodik_parser()
+            found = await asyncio.gather(
+                *(
+                    _single_flight(parser.search_by_id, id=sid, id_type="shikimori", limit=1)
+                    for sid in misses
+                ),
+                return_exceptions=True
+            )
+        except Exception as e:
+            found = [e] * len(misses)
+
+        items = []
+        for sid, result in zip(misses, found):
+            if isinstance(result, parser_errors.NoResults) or (not isinstance(result, Exception) and not result):
+                errors[sid] = "not_found"
+            elif isinstance(result, Exception):
+                if not isinstance(result, CircuitOpenError):
+                    print(f"[KODIK BATCH ERROR] {sid}: {result}")
+                errors[sid] = "upstream_error"
+            else:
+                record = anime_store.record_from_kodik_item(result[0])
+                if record:
+                    records[sid] = {**record, "poster": None, "poster_updated_at": None}
+                    items.append(result[0])
+        if items:
+            _remember_kodik_items(items)
+    elif misses:
+        for sid in misses:
+            errors[sid] = "offline"
+
+    # Kodik недоступен — записи хранилища любой давности
+    unresolved = [sid for sid in unique_ids if sid not in records and errors.get(sid) != "not_found"]
+    if unresolved:
+        stored = await asyncio.to_thread(anime_store.get_records, unresolved, None)
+        for sid, record in stored.items():
+            records[sid] = record
+            stale_ids.add(sid)
+            errors.pop(sid, None)
+
+    # Постеры — одним пакетом для всех, у кого их нет в записи
+    need_posters = [sid for sid, record in records.items() if record.get("poster_updated_at") is None]
+    if need_posters:
+        posters = await get_posters_batch(need_posters)
+        for sid in need_posters:
+            records[sid]["poster"] = posters.get(sid)
+
+    results = []
+    for raw_id, sid in zip(shikimori_ids, ids):
+        if sid is None:
+            results.append({"id": raw_id, "error": "invalid_id"})
+        elif sid in records:
+            card = _batch_card(records[sid])
+            if sid in stale_ids:
+                card["stale"] = True
+            results.append(card)
+        else:
+            results.append({"id": sid, "error": errors.get(sid, "not_found")})
+    return results
+
 
 # ─────────────────────────────────────────────
 # 🎬 M3U8 ВИДЕО
 # ─────────────────────────────────────────────
-async def get_video_m3u8(
+# Подписанная ссылка Kodik: //cloud.kodik-storage.com/useruploads/<uuid>/<hash>:<ts>/720.mp4:hls:manifest.m3u8
+_SIGNED_EXPIRY_RE = re.compile(r":(\d{10})/")
+
+# Время в подписи (YYYYMMDDHH) считаем московским — это раньше, чем UTC, т.е. с запасом
+_KODIK_SIGN_TZ = timezone(timedelta(hours=3))
+
+
+def _parse_link_expiry(url: str) -> Optional[float]:
+    """
+    Момент истечения подписанной ссылки (unix time) или None, если не распознан
+    Поддерживаются YYYYMMDDHH и unix timestamp
+    """
+    match = _SIGNED_EXPIRY_RE.search(url)
+    if not match:
+        return None
+
+    raw = match.group(1)
+    if raw.startswith("20"):
+        try:
+            expires = datetime.strptime(raw, "%Y%m%d%H").replace(tzinfo=_KODIK_SIGN_TZ)
+            return expires.timestamp()
+        except ValueError:
+            # Не дата (месяц 00, час 99 ...) — unix timestamp после 2033 года
+            pass
+    return float(raw)
+
+
+def _m3u8_ttl(url: str) -> float:
+    """TTL ссылки: до истечения подписи минус запас, иначе консервативное значение"""
+    expires_at = _parse_link_expiry(url)
+    if expires_at is None:
+        return M3U8_CACHE_DEFAULT_TTL
+
+    ttl = expires_at - time.time() - M3U8_EXPIRY_MARGIN
+    return max(0.0, min(ttl, M3U8_CACHE_MAX_TTL))
+
+
+# Ступени качества, которые отдаёт Kodik
+KODIK_QUALITIES = [360, 480, 720]
+
+
+def select_quality(playlists: Dict[str, Any], quality: int) -> Optional[str]:
+    """
+    Ссылка нужного качества из набора get_video_playlists
+    Как в get_m3u8_playlist_link: не выше максимума, нестандартное значение → максимум
+    """
+    qualities, max_quality = playlists["qualities"], playlists["max_quality"]
+    selected = min(quality, max_quality) if quality in KODIK_QUALITIES else max_quality
+    return qualities.get(selected) or qualities.get(max_quality)
+
+
+async def _resolve_m3u8(shiki_id: str, seria_num: int, translation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Один запрос в Kodik на серию → плейлисты всех доступных качеств + запись в кеш
+
+    Returns:
+        {"qualities": {360: url, ...}, "max_quality": 720, "expires_at": unix_time} или None
+    """
+    parser = await get_kodik_parser()
+
+    link, max_quality, *_ = await _single_flight(
+        parser.get_link,
+        id=shiki_id,
+        id_type="shikimori",
+        seria_num=seria_num,
+        translation_id=translation_id
+    )
+
+    if not link:
+        return None
+    if link.startswith("//"):
+        link = f"https:{link}"
+
+    max_quality = int(max_quality)
+    qualities = {
+        q: f"{link}{q}.mp4:hls:manifest.m3u8"
+        for q in KODIK_QUALITIES
+        if q <= max_quality
+    }
+    if max_quality not in qualities:
+        qualities[max_quality] = f"{link}{max_quality}.mp4:hls:manifest.m3u8"
+
+    ttl = _m3u8_ttl(link)
+    playlists = {
+        "qualities": qualities,
+        "max_quality": max_quality,
+        "expires_at": time.time() + ttl
+    }
+    if ttl > 0:
+        _m3u8_cache.set((shiki_id, seria_num, translation_id), playlists, ttl=ttl)
+
+    return playlists
+
+
+async def _refresh_m3u8(shiki_id: str, seria_num: int, translation_id: str) -> None:
+    global _m3u8_background_refreshes
+    try:
+        await _resolve_m3u8(shiki_id, seria_num, translation_id)
+        _m3u8_background_refreshes += 1
+    except Exception as e:
+        print(f"[KODIK VIDEO REFRESH ERROR] {e}")
+
+
+async def get_video_playlists(
     shikimori_id: str,
     episode_num: int,
-    translation_id: str,
-    quality: int = 720
-) -> Optional[str]:
+    translation_id: str
+) -> Optional[Dict[str, Any]]:
     """
-    Получение прямой ссылки на m3u8 плейлист
+    Плейлисты всех качеств серии одним запросом к Kodik
+    ✅ Кешируются целиком с TTL по сроку подписи ссылки
+    ✅ Ссылки, которые скоро истекут, обновляются в фоне
     """
-    parser = await get_kodik_parser()
     shiki_id = normalize_shikimori_id(shikimori_id)
 
     if not shiki_id:
         return None
 
-    try:
-        seria_num = episode_num if episode_num > 0 else 0
-
-        url = await parser.get_m3u8_playlist_link(
-            id=shiki_id,
-            id_type="shikimori",
-            seria_num=seria_num,
-            translation_id=str(translation_id),
-            quality=quality
-        )
+    seria_num = episode_num if episode_num > 0 else 0
+    translation_id = str(translation_id)
+    key = (shiki_id, seria_num, translation_id)
 
-        if url and url.startswith("//"):
-            url = f"https:{url}"
+    cached = _m3u8_cache.get(key)
+    if cached is not MISSING:
+        if _prefetched_keys.pop(key, None):
+            global _prefetch_hits
+            _prefetch_hits += 1
+        if cached["expires_at"] - time.time() < M3U8_REFRESH_BEFORE:
+            _run_in_background(_refresh_m3u8(shiki_id, seria_num, translation_id))
+        return cached
 
-        return url
+    try:
+        return await _resolve_m3u8(shiki_id, seria_num, translation_id)
 
     except Exception as e:
         print(f"[KODIK VIDEO ERROR] {e}")
         return None
+
+
+async def get_video_m3u8(
+    shikimori_id: str,
+    episode_num: int,
+    translation_id: str,
+    quality: int = 720
+) -> Optional[str]:
+    """
+    Получение прямой ссылки на m3u8 плейлист
+    ✅ Берётся из общего набора качеств серии (смена качества — без запроса к Kodik)
+    """
+    playlists = await get_video_playlists(shikimori_id, episode_num, translation_id)
+    if not playlists:
+        return None
+
+    return select_quality(playlists, quality)
     
 
+async def _prefetch_m3u8(shiki_id: str, seria_num: int, translation_id: str) -> None:
+    key = (shiki_id, seria_num, translation_id)
+    try:
+        playlists = await _resolve_m3u8(shiki_id, seria_num, translation_id)
+        if playlists:
+            ttl = playlists["expires_at"] - time.time()
+            if ttl > 0:
+                _prefetched_keys.set(key, True, ttl=ttl)
+    except Exception as e:
+        print(f"[KODIK PREFETCH ERROR] {e}")
+    finally:
+        _prefetch_in_flight.discard(key)
+
+
+def prefetch_next_episode(
+    shikimori_id: str,
+    episode_num: int,
+    translation_id: Optional[str],
+    progress_seconds: int,
+    duration_seconds: int
+) -> bool:
+    """
+    Фоновая подготовка m3u8 следующей серии, когда текущая почти досмотрена
+    (progress / duration >= PREFETCH_PROGRESS_THRESHOLD)
+    ✅ После последней серии (по series_count из кеша переводов) ничего не запускается
+
+    Returns:
+        True, если предзагрузка запущена
+    """
+    global _prefetch_started
+
+    shiki_id = normalize_shikimori_id(shikimori_id)
+    if not shiki_id or not translation_id or duration_seconds <= 0:
+        return False
+
+    if progress_seconds / duration_seconds < PREFETCH_PROGRESS_THRESHOLD:
+        return False
+
+    next_episode = max(episode_num, 0) + 1
+    matrix = _translations_cache.peek(shiki_id)
+    if matrix is not MISSING and matrix.get("series_count") is not None and next_episode > matrix["series_count"]:
+        return False
+
+    key = (shiki_id, next_episode, str(translation_id))
+    if key in _m3u8_cache or key in _prefetch_in_flight:
+        return False
+
+    _prefetch_in_flight.add(key)
+    _prefetch_started += 1
+    _run_in_background(_prefetch_m3u8(shiki_id, next_episode, str(translation_id)))
+    return True
+
+
 # ─────────────────────────────────────────────
 # 🎭 АНИМЕ ПО ЖАНРУ
 # ─────────────────────────────────────────────
-async def get_anime_by_genre(genre: str, page: int = 1, per_page: int = 10) -> Dict[str, Any]:
+GENRE_MAPPING: Dict[str, List[str]] = {
+    "экшен": ["action", "экшен", "экшн", "боевик"],
+    "приключения": ["adventure", "приключения"],
+    "комедия": ["comedy", "комедия"],
+    "драма": ["drama", "драма"],
+    "фэнтези": ["fantasy", "фэнтези"],
+    "романтика": ["romance", "романтика", "мелодрама"],
+    "sci-fi": ["sci-fi", "фантастика", "научная фантастика"],
+    "триллер": ["thriller", "триллер"],
+    "мистика": ["mystery", "мистика"],
+    "психология": ["psychological", "психология"],
+    "школа": ["school", "школа"],
+    "спорт": ["sports", "спорт"],
+    "сёнэн": ["shounen", "сёнэн", "shonen"],
+    "сёдзё": ["shoujo", "сёдзё", "shojo"],
+    "сэйнэн": ["seinen", "сэйнэн"],
+    "меха": ["mecha", "меха"],
+    "музыка": ["music", "музыка"],
+    "детектив": ["detective", "детектив"],
+    "ужасы": ["horror", "ужасы"],
+    "повседневность": ["slice of life", "повседневность"],
+    "военное": ["military", "военное"],
+    "история": ["historical", "история"],
+    "безумие": ["dementia", "безумие"],
+    "демоны": ["demons", "демоны"],
+    "игры": ["game", "игры"],
+    "магия": ["magic", "магия"],
+    "пародия": ["parody", "пародия"],
+    "самураи": ["samurai", "самураи"],
+    "супер сила": ["super power", "супер сила"],
+    "вампиры": ["vampire", "вампиры"],
+}
+
+_genre_index = GenreIndex(GENRE_MAPPING)
+# Фильтры/сортировка/счётчики жанров по локальному каталогу (наполняется вместе с поисковым индексом)
+_catalog_index = CatalogIndex(GENRE_MAPPING)
+
+
+def _genre_card(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Карточка аниме для жанровой выдачи (постер заполняется позже)"""
+    shiki_id = normalize_shikimori_id(item.get("shikimori_id"))
+    if not shiki_id:
+        return None
+
+    material = item.get("material_data") or {}
+    return {
+        "id": shiki_id,
+        "title": item.get("title"),
+        "title_orig": material.get("title_orig"),
+        "year": item.get("year"),
+        "type": item.get("type"),
+        "poster": None,  # ← Заполним позже
+        "screenshots": item.get("screenshots", []),
+        "description": material.get("description"),
+        "genres": material.get("genres", []),
+        "status": material.get("status"),
+        "rating": material.get("shikimori_rating")
+    }
+
+
+async def _fill_posters(items: List[Dict[str, Any]]) -> None:
+    """Проставляет постеры из Shikimori (fallback — первый скриншот) и убирает скриншоты"""
+    if not items:
+        return
+
+    print(f"🖼️ Загружаем постеры из Shikimori для {len(items)} аниме...")
+    posters = await get_posters_batch([item["id"] for item in items])
+
+    for item in items:
+        poster_url = posters.get(item["id"])
+        item["poster"] = poster_url
+        # Fallback на скриншот
+        if not poster_url and item.get("screenshots"):
+            item["poster"] = item["screenshots"][0]
+        # Убираем скриншоты из ответа
+        item.pop("screenshots", None)
+
+
+async def refresh_genre_index() -> None:
+    """Перестраивает жанровый индекс по списку Kodik"""
+    parser = await get_kodik_parser()
+
+    data, _ = await _single_flight(
+        parser.get_list,
+        limit_per_page=100,
+        pages_to_parse=GENRE_INDEX_PAGES,
+        include_material_data=True,
+        only_anime=True
+    )
+
+    _store_in_background(anime_store.save_kodik_items, data)
+    await _index_kodik_items_chunked(data)
+
+    cards = [card for card in (_genre_card(item) for item in data) if card]
+    await asyncio.to_thread(_genre_index.build, cards)
+
+    print(f"🎭 Жанровый индекс обновлён: {len(cards)} записей за {_genre_index.build_duration:.2f}с")
+
+
+async def _genre_index_loop() -> None:
+    while True:
+        if is_offline():
+            # Kodik недоступен — индекс из хранилища остаётся; пробный запрос по таймеру breaker'а
+            _poll_kodik_breaker()
+            await asyncio.sleep(OFFLINE_POLL_INTERVAL)
+            continue
+        try:
+            if await _catalog_sync_fresh():
+                # Каталог синхронизирует воркер — индекс обновляет reload_from_store, без обхода Kodik
+                await asyncio.sleep(GENRE_INDEX_REFRESH_INTERVAL)
+                continue
+            await refresh_genre_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[GENRE INDEX ERROR] {e}")
+        await asyncio.sleep(GENRE_INDEX_REFRESH_INTERVAL)
+
+
+async def get_anime_by_genre(
+    genre: str,
+    page: int = 1,
+    per_page: int = 10,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Получение аниме по жанру с пагинацией
+    ✅ Первые страницы жанров отдаются из снимка фонового прогрева
+    ✅ Страница — срез готового жанрового индекса (без загрузки каталога)
+    ✅ Пока индекс не построен — старый путь через get_list
     ✅ Постеры загружаются из Shikimori
+    ✅ В деградированном режиме — срез индекса (stale), без Kodik
     """
-    parser = await get_kodik_parser()
+    if cursor is None:
+        snapshot_page = _catalog_snapshot["genres"].get((genre.lower(), page, per_page))
+        if snapshot_page is not None:
+            _catalog_snapshot["served"] += 1
+            if is_offline():
+                return {**snapshot_page, "results": _mark_stale(snapshot_page["results"]), "stale": True}
+            return {
+                **snapshot_page,
+                "results": [dict(item) for item in snapshot_page["results"]]
+            }
 
-    try:
-        genre_lower = genre.lower()
-        genre_mapping = {
-            "экшен": ["action", "экшен", "экшн", "боевик"],
-            "приключения": ["adventure", "приключения"],
-            "комедия": ["comedy", "комедия"],
-            "драма": ["drama", "драма"],
-            "фэнтези": ["fantasy", "фэнтези"],
-            "романтика": ["romance", "романтика", "мелодрама"],
-            "sci-fi": ["sci-fi", "фантастика", "научная фантастика"],
-            "триллер": ["thriller", "триллер"],
-            "мистика": ["mystery", "мистика"],
-            "психология": ["psychological", "психология"],
-            "школа": ["school", "школа"],
-            "спорт": ["sports", "спорт"],
-            "сёнэн": ["shounen", "сёнэн", "shonen"],
-            "сёдзё": ["shoujo", "сёдзё", "shojo"],
-            "сэйнэн": ["seinen", "сэйнэн"],
-            "меха": ["mecha", "меха"],
-            "музыка": ["music", "музыка"],
-            "детектив": ["detective", "детектив"],
-            "ужасы": ["horror", "ужасы"],
-            "повседневность": ["slice of life", "повседневность"],
-            "военное": ["military", "военное"],
-            "история": ["historical", "история"],
-            "безумие": ["dementia", "безумие"],
-            "демоны": ["demons", "демоны"],
-            "игры": ["game", "игры"],
-            "магия": ["magic", "магия"],
-            "пародия": ["parody", "пародия"],
-            "самураи": ["samurai", "самураи"],
-            "супер сила": ["super power", "супер сила"],
-            "вампиры": ["vampire", "вампиры"],
+    key = ("genre", genre.lower(), page, per_page, cursor)
+    data = await _load_anime_by_genre(genre, page, per_page, cursor)
+    if data is not None and is_offline():
+        # Срез жанрового индекса без свежих данных Kodik
+        return {**data, "results": _mark_stale(data["results"]), "stale": True}
+    if data is None:
+        # Kodik недоступен — последний удачный ответ с пометкой stale
+        stale = _last_good.get(key)
+        if stale is not MISSING:
+            return {**stale, "results": _mark_stale(stale["results"]), "stale": True}
+        return {"results": [], "has_more": False, "current_page": page, "next_cursor": None}
+
+    if data["results"]:
+        _last_good.set(key, data)
+    return data
+
+
+async def _load_anime_by_genre(
+    genre: str,
+    page: int = 1,
+    per_page: int = 10,
+    cursor: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Жанровая страница без снимка (None — ошибка Kodik)
+    ✅ Страница — срез готового жанрового индекса (без загрузки каталога)
+    ✅ Пока индекс не построен — старый путь через get_list
+    ✅ Постеры загружаются из Shikimori
+    """
+    if _genre_index.ready:
+        paginated, has_more, next_cursor = _genre_index.page(genre, page, per_page, cursor)
+        await _fill_posters(paginated)
+
+        return {
+            "results": paginated,
+            "has_more": has_more,
+            "current_page": page,
+            "next_cursor": next_cursor
         }
 
-        search_genres = genre_mapping.get(genre_lower, [genre_lower])
+    if is_offline():
+        return None
+
+    try:
+        parser = await get_kodik_parser()
+
+        genre_lower = genre.lower()
+        search_genres = GENRE_MAPPING.get(genre_lower, [genre_lower])
         
         pages_to_load = page * 3
         
         print(f"📄 Загружаем {pages_to_load} страниц из Kodik (page={page})")
 
-        data, next_page = await parser.get_list(
+        data, next_page = await _single_flight(
+            parser.get_list,
             limit_per_page=100,
             pages_to_parse=pages_to_load,
             include_material_data=True,
@@ -490,38 +2263,24 @@ async def get_anime_by_genre(genre: str, page: int = 1, per_page: int = 10) -> D
         )
 
         print(f"📊 Получено из Kodik: {len(data)} записей")
+        _remember_kodik_items(data)
 
         grouped: Dict[str, Dict] = {}
         
         for item in data:
-            shiki_id = normalize_shikimori_id(item.get("shikimori_id"))
-            if not shiki_id or shiki_id in grouped:
+            card = _genre_card(item)
+            if not card or card["id"] in grouped:
                 continue
 
-            material = item.get("material_data") or {}
-            item_genres = material.get("genres", [])
-            
             genre_match = any(
-                any(search.lower() in g.lower() for g in item_genres)
+                any(search.lower() in g.lower() for g in card["genres"])
                 for search in search_genres
             )
 
             if not genre_match:
                 continue
 
-            grouped[shiki_id] = {
-                "id": shiki_id,
-                "title": item.get("title"),
-                "title_orig": material.get("title_orig"),
-                "year": item.get("year"),
-                "type": item.get("type"),
-                "poster": None,  # ← Заполним позже
-                "screenshots": item.get("screenshots", []),
-                "description": material.get("description"),
-                "genres": item_genres,
-                "status": material.get("status"),
-                "rating": material.get("shikimori_rating")
-            }
+            grouped[card["id"]] = card
 
         all_results = list(grouped.values())
         
@@ -530,19 +2289,7 @@ async def get_anime_by_genre(genre: str, page: int = 1, per_page: int = 10) -> D
         paginated = all_results[offset:offset + per_page]
         
         # ✅ Загружаем постеры только для текущей страницы
-        if paginated:
-            print(f"🖼️ Загружаем постеры из Shikimori для {len(paginated)} аниме...")
-            poster_ids = [item["id"] for item in paginated]
-            posters = await get_posters_batch(poster_ids)
-            
-            for item in paginated:
-                poster_url = posters.get(item["id"])
-                item["poster"] = poster_url
-                # Fallback на скриншот
-                if not poster_url and item.get("screenshots"):
-                    item["poster"] = item["screenshots"][0]
-                # Убираем скриншоты из ответа
-                item.pop("screenshots", None)
+        await _fill_posters(paginated)
         
         has_more = len(all_results) > offset + per_page or next_page is not None
         
@@ -551,12 +2298,75 @@ async def get_anime_by_genre(genre: str, page: int = 1, per_page: int = 10) -> D
         return {
             "results": paginated,
             "has_more": has_more,
-            "current_page": page
+            "current_page": page,
+            "next_cursor": None
         }
 
+    except CircuitOpenError:
+        return None
+
     except Exception as e:
         print(f"[KODIK GENRE ERROR] {e}")
-        return {"results": [], "has_more": False, "current_page": page}
+        return None
+
+
+# ─────────────────────────────────────────────
+# 🧮 ФИЛЬТРЫ КАТАЛОГА
+# ─────────────────────────────────────────────
+async def query_catalog(
+    genre: Optional[str] = None,
+    year: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    sort: str = "rating",
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Выборка из локального каталога с фильтрами
+    ✅ Фильтры комбинируются: жанр, год/диапазон лет, статус, тип, минимальный рейтинг
+    ✅ Сортировка по рейтингу, году или названию
+    ✅ Пагинация курсором (shikimori_id последнего элемента)
+    ✅ Без обращений к Kodik — только постеры (из кеша/хранилища/Shikimori)
+    """
+    if year is not None:
+        year_from = year_to = year
+
+    results, has_more, next_cursor = _catalog_index.query(
+        genre=genre,
+        year_from=year_from,
+        year_to=year_to,
+        status=status,
+        type=type,
+        min_rating=min_rating,
+        sort=sort,
+        limit=limit,
+        cursor=cursor
+    )
+    await _fill_posters(results)
+
+    # Без Kodik каталог не обновляется — помечаем выдачу как stale
+    stale = is_offline()
+    return {
+        "results": _mark_stale(results) if stale else results,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "total_indexed": len(_catalog_index),
+        "stale": stale
+    }
+
+
+def get_genre_counts(genres: Optional[List[str]] = None) -> Dict[str, int]:
+    """Сколько аниме локального каталога в каждом жанре"""
+    return _catalog_index.genre_counts(genres)
+
+
+def get_catalog_facets() -> Dict[str, Dict[Any, int]]:
+    """Значения фильтров каталога со счётчиками (статусы, типы, годы)"""
+    return _catalog_index.facets()
 
 
 # ─────────────────────────────────────────────
@@ -565,18 +2375,55 @@ async def get_anime_by_genre(genre: str, page: int = 1, per_page: int = 10) -> D
 async def get_trending_anime(limit: int = 12) -> List[Dict[str, Any]]:
     """
     Получение списка популярных аниме
+    ✅ Готовый снимок от фонового прогрева отдаётся сразу
     ✅ Постеры загружаются из Shikimori
+    ✅ В деградированном режиме — из локального хранилища (stale)
     """
-    parser = await get_kodik_parser()
+    trending = _catalog_snapshot["trending"]
+    if len(trending) >= limit:
+        _catalog_snapshot["served"] += 1
+        if is_offline():
+            return _mark_stale(trending[:limit])
+        return [dict(item) for item in trending[:limit]]
+
+    results = None if is_offline() else await _load_trending_anime(limit)
+    if results is None:
+        # Kodik недоступен — последний удачный ответ или недавние записи хранилища, с пометкой stale
+        stale = _last_good.get(("trending",))
+        if stale is MISSING:
+            stale = await _load_trending_local(limit)
+        return _mark_stale(stale[:limit])
+
+    if results:
+        _last_good.set(("trending",), results)
+    return results
+
 
+async def _load_trending_local(limit: int) -> List[Dict[str, Any]]:
+    """Недавно обновлённые аниме из локального хранилища (аналог первой страницы списка Kodik)"""
+    records = await asyncio.to_thread(anime_store.get_recent, limit)
+    results = [
+        card for card in (_genre_card(_kodik_item_from_record(r)) for r in records) if card
+    ]
+    await _fill_posters(results)
+    return results
+
+
+async def _load_trending_anime(limit: int) -> Optional[List[Dict[str, Any]]]:
+    """Популярные аниме напрямую из Kodik (None — ошибка Kodik)"""
     try:
-        data, _ = await parser.get_list(
+        parser = await get_kodik_parser()
+
+        data, _ = await _single_flight(
+            parser.get_list,
             limit_per_page=limit * 5,
             pages_to_parse=1,
             include_material_data=True,
             only_anime=True
         )
 
+        _remember_kodik_items(data)
+
         grouped: Dict[str, Dict] = {}
 
         for item in data:
@@ -603,22 +2450,113 @@ async def get_trending_anime(limit: int = 12) -> List[Dict[str, Any]]:
         results = list(grouped.values())
         
         # ✅ Загружаем постеры из Shikimori
-        if results:
-            print(f"🖼️ Загружаем постеры из Shikimori для {len(results)} аниме...")
-            poster_ids = [item["id"] for item in results]
-            posters = await get_posters_batch(poster_ids)
-            
-            for item in results:
-                poster_url = posters.get(item["id"])
-                item["poster"] = poster_url
-                # Fallback на скриншот
-                if not poster_url and item.get("screenshots"):
-                    item["poster"] = item["screenshots"][0]
-                # Убираем скриншоты из ответа
-                item.pop("screenshots", None)
+        await _fill_posters(results)
 
         return results
 
+    except CircuitOpenError:
+        return None
+
     except Exception as e:
         print(f"[KODIK TRENDING ERROR] {e}")
-        return []
\ No newline at end of file
+        return None
+
+
+# ─────────────────────────────────────────────
+# 🔥 ПРОГРЕВ КАТАЛОГА
+# ─────────────────────────────────────────────
+# Снимок готовых ответов: trending и первые страницы жанров
+_catalog_snapshot: Dict[str, Any] = {
+    "trending": [],
+    "genres": {},          # (жанр, page, per_page) → ответ get_anime_by_genre
+    "built_at": None,
+    "refresh_duration": None,
+    "served": 0
+}
+
+
+async def refresh_catalog_snapshot() -> None:
+    """Пересобирает снимок trending и первых страниц всех жанров"""
+    started = time.monotonic()
+
+    trending = await _load_trending_anime(PREWARM_TRENDING_LIMIT)
+
+    genres: Dict[tuple, Dict[str, Any]] = {}
+    # Без жанрового индекса прогрев жанров означал бы скачивание каталога — ждём индекс
+    if _genre_index.ready:
+        for genre in GENRE_MAPPING:
+            for page in range(1, PREWARM_GENRE_PAGES + 1):
+                data = await _load_anime_by_genre(genre, page, PREWARM_GENRE_PER_PAGE)
+                if data is None:
+                    break
+                genres[(genre, page, PREWARM_GENRE_PER_PAGE)] = data
+                if not data["has_more"]:
+                    break
+
+    # Пустой ответ (Kodik недоступен) не затирает предыдущий снимок
+    _catalog_snapshot.update({
+        "trending": trending or _catalog_snapshot["trending"],
+        "genres": genres or _catalog_snapshot["genres"],
+        "built_at": time.time(),
+        "refresh_duration": time.monotonic() - started
+    })
+
+    print(f"🔥 Снимок каталога обновлён за {_catalog_snapshot['refresh_duration']:.2f}с "
+          f"(trending: {len(trending or [])}, страниц жанров: {len(genres)})")
+
+
+async def _catalog_prewarm_loop() -> None:
+    while True:
+        if is_offline():
+            _poll_kodik_breaker()
+            await asyncio.sleep(OFFLINE_POLL_INTERVAL)
+            continue
+        try:
+            await refresh_catalog_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[CATALOG PREWARM ERROR] {e}")
+        # Пока жанровый индекс строится — повторяем чаще, чтобы прогреть жанры
+        await asyncio.sleep(PREWARM_INTERVAL if _genre_index.ready else 15)
+
+
+def _catalog_snapshot_stats() -> Dict[str, Any]:
+    built_at = _catalog_snapshot["built_at"]
+    duration = _catalog_snapshot["refresh_duration"]
+    return {
+        "trending": len(_catalog_snapshot["trending"]),
+        "genre_pages": len(_catalog_snapshot["genres"]),
+        "age_seconds": round(time.time() - built_at, 1) if built_at else None,
+        "refresh_duration": round(duration, 3) if duration is not None else None,
+        "served": _catalog_snapshot["served"]
+    }
+
+
+# ═══════════════════════════════════════════
+# ФОНОВЫЕ ЗАДАЧИ
+# ═══════════════════════════════════════════
+
+_jobs: List[asyncio.Task] = []
+
+
+def start_background_jobs() -> None:
+    """Запускает периодические задачи парсера (вызывается при старте приложения)"""
+    if _jobs:
+        return
+    _jobs.append(asyncio.create_task(load_search_index()))
+    _jobs.append(asyncio.create_task(_genre_index_loop()))
+    _jobs.append(asyncio.create_task(_store_reload_loop()))
+    _jobs.append(asyncio.create_task(_catalog_prewarm_loop()))
+
+
+async def stop_background_jobs() -> None:
+    """Останавливает периодические задачи парсера и закрывает общий HTTP-пул"""
+    for job in _jobs:
+        job.cancel()
+    await asyncio.gather(*_jobs, return_exceptions=True)
+    _jobs.clear()
+    for handle in _translations_refreshes.values():
+        handle.cancel()
+    _translations_refreshes.clear()
+    await close_http_session()
@@ -0,0 +1,71 @@
+from typing import Any, Dict, List
+
+
+class ParserPool:
+    """
+    Пул экземпляров парсера одного upstream (Kodik или Shikimori)
+
+    Экземпляры создаются один раз при старте (fill), после этого выбор
+    экземпляра (pick) — обычное чтение без блокировок.
+    - round_robin: экземпляры по очереди
+    - least_busy: экземпляр с наименьшим числом запросов в работе
+      (при равенстве — по очереди), чтобы медленный скрейп не задерживал остальные
+    """
+
+    STRATEGIES = ("round_robin", "least_busy")
+
+    def __init__(self, name: str, strategy: str = "least_busy") -> None:
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия пула: {strategy}")
+        self.name = name
+        self.strategy = strategy
+        self._instances: List[Any] = []
+        # id(экземпляра) → запросов в работе / всего запросов
+        self._busy: Dict[int, int] = {}
+        self._served: Dict[int, int] = {}
+        self._next = 0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._instances)
+
+    def fill(self, instances: List[Any]) -> None:
+        self._instances = list(instances)
+        self._busy = {id(instance): 0 for instance in self._instances}
+        self._served = {id(instance): 0 for instance in self._instances}
+        self._next = 0
+
+    def pick(self) -> Any:
+        """Экземпляр для следующего запроса"""
+        count = len(self._instances)
+        start = self._next % count
+        self._next = start + 1
+
+        if self.strategy == "round_robin" or count == 1:
+            return self._instances[start]
+
+        best = self._instances[start]
+        for offset in range(1, count):
+            instance = self._instances[(start + offset) % count]
+            if self._busy[id(instance)] < self._busy[id(best)]:
+                best = instance
+        return best
+
+    def started(self, instance: Any) -> None:
+        key = id(instance)
+        if key in self._busy:
+            self._busy[key] += 1
+            self._served[key] += 1
+
+    def finished(self, instance: Any) -> None:
+        key = id(instance)
+        if key in self._busy:
+            self._busy[key] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._instances),
+            "strategy": self.strategy,
+            "in_flight": [self._busy[id(instance)] for instance in self._instances],
+            "served": [self._served[id(instance)] for instance in self._instances],
+        }
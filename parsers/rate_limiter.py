@@ -0,0 +1,121 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After: число секунд или HTTP-дата → секунды ожидания"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """
+    Адаптивный token bucket для одного upstream-хоста
+
+    - запрос ждёт токен, токены пополняются со скоростью rate (запросов/сек)
+    - каждый успешный ответ поднимает rate на increase (до max_rate)
+    - 429 и 5xx уменьшают rate в decrease раз (не чаще раза в секунду) до min_rate
+    - Retry-After останавливает выдачу токенов на указанное время
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = 5.0,
+        min_rate: float = 0.5,
+        max_rate: float = 50.0,
+        burst: float = 5.0,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        max_retry_after: float = 60.0
+    ) -> None:
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retry_after = max_retry_after
+
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.waiting = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Ждёт токен для запроса"""
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        self.requests += 1
+        self.waited += time.monotonic() - started
+
+    def on_response(self, status: int, retry_after: Optional[str] = None) -> None:
+        """Подстраивает скорость по ответу upstream"""
+        if status == 429 or status >= 500:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= 1.0:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+
+            delay = parse_retry_after(retry_after)
+            if delay is not None:
+                self._blocked_until = max(
+                    self._blocked_until, now + min(delay, self.max_retry_after)
+                )
+                self._tokens = 0.0
+            return
+
+        self._refill(time.monotonic())
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self) -> Dict[str, Any]:
+        blocked_for = self._blocked_until - time.monotonic()
+        return {
+            "rate": round(self.rate, 2),
+            "tokens": round(min(self.burst, self._tokens), 2),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waiting": self.waiting,
+            "avg_wait": round(self.waited / self.requests, 3) if self.requests else 0.0,
+            "blocked_for": round(blocked_for, 1) if blocked_for > 0 else 0.0,
+        }
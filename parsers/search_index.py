@@ -0,0 +1,213 @@
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы как в pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа"""
+    grams: Set[str] = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Триграммный индекс названий аниме в памяти процесса
+
+    Для каждого аниме индексируются все названия (русское, оригинальное, альтернативные),
+    оценка аниме — лучшая оценка среди его названий:
+    - доля триграмм запроса, найденных в названии (запрос целиком входит в название → 1.0)
+    - с небольшим весом сходство названия целиком (точное совпадение выше продолжения)
+    Рядом хранится отсортированный массив нормализованных названий для автодополнения по префиксу.
+    Индекс меняется только из event loop, поэтому блокировки не нужны.
+    """
+
+    CONTAINMENT_WEIGHT = 0.8
+
+    def __init__(self, normalize: Callable[[str], str]) -> None:
+        self.normalize = normalize
+        # shikimori_id → карточка аниме
+        self._cards: Dict[str, Dict[str, Any]] = {}
+        # shikimori_id → номера записей-названий
+        self._doc_entries: Dict[str, List[int]] = {}
+        # номер записи → (shikimori_id, число триграмм)
+        self._entries: Dict[int, Tuple[str, int]] = {}
+        # триграмма → номера записей
+        self._postings: Dict[str, Set[int]] = {}
+        self._next_entry = 0
+
+        # нормализованное название → shikimori_id; отсортированные ключи пересобираются лениво
+        self._title_ids: Dict[str, Set[str]] = {}
+        self._doc_titles: Dict[str, List[str]] = {}
+        self._sorted_titles: List[str] = []
+        self._titles_dirty = False
+
+        self.searches = 0
+        self.search_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __contains__(self, shikimori_id: str) -> bool:
+        return shikimori_id in self._cards
+
+    def _key(self, text: str) -> str:
+        return self.normalize(text or "").lower()
+
+    def _remove(self, shikimori_id: str) -> None:
+        entries = set(self._doc_entries.pop(shikimori_id, []))
+        for entry in entries:
+            self._entries.pop(entry, None)
+        for key in self._doc_titles.pop(shikimori_id, []):
+            # Триграммы названия пересчитываются, чтобы сразу убрать записи из их списков
+            for gram in trigrams(key):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings -= entries
+                    if not postings:
+                        del self._postings[gram]
+            ids = self._title_ids.get(key)
+            if ids is not None:
+                ids.discard(shikimori_id)
+                if not ids:
+                    del self._title_ids[key]
+                    self._titles_dirty = True
+
+    def add(self, card: Dict[str, Any], titles: List[str]) -> None:
+        """
+        Добавляет (или заменяет) аниме
+
+        Args:
+            card: карточка для выдачи ({"id", "title", ...})
+            titles: все названия аниме
+        """
+        shikimori_id = card["id"]
+        self._remove(shikimori_id)
+
+        entries = []
+        seen = set()
+        for title in titles:
+            key = self._key(title)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+
+            grams = trigrams(key)
+            if not grams:
+                continue
+
+            entry = self._next_entry
+            self._next_entry += 1
+            self._entries[entry] = (shikimori_id, len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(entry)
+            entries.append(entry)
+
+        if entries:
+            self._cards[shikimori_id] = card
+            self._doc_entries[shikimori_id] = entries
+            self._doc_titles[shikimori_id] = list(seen)
+            for key in seen:
+                if key not in self._title_ids:
+                    self._title_ids[key] = set()
+                    self._titles_dirty = True
+                self._title_ids[key].add(shikimori_id)
+        else:
+            self._cards.pop(shikimori_id, None)
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """Оценки всех аниме, у которых есть общие с запросом триграммы"""
+        query_grams = trigrams(self._key(query))
+        if not query_grams:
+            return {}
+
+        shared_counts: Counter = Counter()
+        for gram in query_grams:
+            postings = self._postings.get(gram)
+            if postings:
+                shared_counts.update(postings)
+
+        best: Dict[str, float] = {}
+        for entry, shared in shared_counts.items():
+            shikimori_id, size = self._entries[entry]
+            containment = shared / len(query_grams)
+            similarity = shared / (len(query_grams) + size - shared)
+            score = self.CONTAINMENT_WEIGHT * containment + (1 - self.CONTAINMENT_WEIGHT) * similarity
+            if score > best.get(shikimori_id, 0.0):
+                best[shikimori_id] = score
+        return best
+
+    def search(self, query: str, limit: int = 12, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Ранжированный поиск
+
+        Returns:
+            [(shikimori_id, оценка)] по убыванию оценки (при равенстве — по рейтингу)
+        """
+        started = time.perf_counter()
+
+        ranked = sorted(
+            (
+                (shikimori_id, score)
+                for shikimori_id, score in self.scores(query).items()
+                if score >= min_score
+            ),
+            key=lambda hit: (-hit[1], -(self._cards[hit[0]].get("rating") or 0))
+        )[:limit]
+
+        self.searches += 1
+        self.search_time += time.perf_counter() - started
+        return [(shikimori_id, round(score, 4)) for shikimori_id, score in ranked]
+
+    def suggest(self, prefix: str, limit: int = 10, scan: int = 200) -> List[str]:
+        """
+        Автодополнение: аниме, одно из названий которых начинается с prefix
+
+        Args:
+            scan: сколько подходящих названий просматривать (для коротких префиксов их тысячи)
+
+        Returns:
+            shikimori_id: сначала точное совпадение, дальше по рейтингу
+        """
+        key = self._key(prefix)
+        if not key:
+            return []
+
+        if self._titles_dirty:
+            self._sorted_titles = sorted(self._title_ids)
+            self._titles_dirty = False
+
+        exact: Set[str] = set()
+        found: Set[str] = set()
+        position = bisect_left(self._sorted_titles, key)
+        for title in self._sorted_titles[position:position + scan]:
+            if not title.startswith(key):
+                break
+            ids = self._title_ids.get(title, ())
+            found.update(ids)
+            if title == key:
+                exact.update(ids)
+
+        ranked = sorted(
+            found,
+            key=lambda sid: (sid not in exact, -(self._cards[sid].get("rating") or 0))
+        )
+        return ranked[:limit]
+
+    def card(self, shikimori_id: str) -> Optional[Dict[str, Any]]:
+        card = self._cards.get(shikimori_id)
+        return dict(card) if card is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "anime": len(self._cards),
+            "titles": len(self._entries),
+            "distinct_titles": len(self._title_ids),
+            "trigrams": len(self._postings),
+            "searches": self.searches,
+            "avg_search_ms": round(self.search_time / self.searches * 1000, 3) if self.searches else 0.0,
+        }
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов (single-flight)
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же ключом
+    не запускают свою копию, а ждут результат (или исключение) первого.
+    Общий запрос отменяется, только когда отменены все ожидающие.
+    """
+
+    def __init__(self) -> None:
+        # key → [задача, количество ожидающих]
+        self._inflight: Dict[Hashable, List[Any]] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _: self._forget(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+                # Новые вызовы не должны присоединиться к отменяемому запросу
+                self._forget(key, entry)
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key: Hashable, entry: List[Any]) -> None:
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.shared,
+            "in_flight": len(self._inflight),
+            "dedup_rate": round(self.shared / self.calls, 4) if self.calls else 0.0,
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -86,6 +86,15 @@ class UserProfileUpdate(BaseModel):
         return v
 
 
+# ═══════════════════════════════════════════
+# АНИМЕ
+# ═══════════════════════════════════════════
+
+class AnimeBatchRequest(BaseModel):
+    """Пакетный запрос карточек аниме"""
+    ids: List[str]
+
+
 # ═══════════════════════════════════════════
 # ИЗБРАННОЕ
 # ═══════════════════════════════════════════
@@ -0,0 +1,106 @@
+"""
+TTLCache: время жизни, негативный кеш, вытеснение по LRU и по объёму
+
+Запуск: python -m pytest -q tests
+"""
+import pytest
+
+from parsers import cache as cache_module
+from parsers.cache import MISSING, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время вместо time.monotonic"""
+    now = {"value": 1000.0}
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now["value"])
+    return now
+
+
+def test_ttl_expiry(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    clock["value"] += 9
+    assert cache.get("a") == 1
+    clock["value"] += 1
+    assert cache.get("a") is MISSING
+    assert "a" not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_explicit_ttl_overrides_default(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1, ttl=100)
+    clock["value"] += 50
+    assert cache.get("a") == 1
+
+
+def test_negative_ttl(clock):
+    cache = TTLCache(ttl=100, negative_ttl=5)
+    cache.set("missing", None)
+    cache.set("found", "poster")
+
+    # None — валидное значение, отличимое от промаха
+    assert cache.get("missing") is None
+    clock["value"] += 5
+    assert cache.get("missing") is MISSING
+    assert cache.get("found") == "poster"
+
+
+def test_peek_does_not_touch_lru_or_counters(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    cache.set("c", 3)
+
+    assert cache.peek("a") is MISSING
+    assert cache.stats()["hits"] == 0
+
+
+def test_lru_eviction(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_eviction(clock):
+    cache = TTLCache(maxsize=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    assert cache.bytes == 8
+
+    cache.set("c", "xxxx")
+    assert "a" not in cache
+    assert cache.bytes == 8
+
+    # Замена записи пересчитывает объём
+    cache.set("b", "x")
+    assert cache.bytes == 5
+
+    # Одна запись больше лимита всё равно сохраняется
+    cache.set("big", "x" * 50)
+    assert len(cache) == 1
+    assert cache.get("big") == "x" * 50
+
+
+def test_pop_respects_expiry(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", True)
+    cache.set("b", True)
+
+    assert cache.pop("a") is True
+    assert cache.pop("a") is None
+
+    clock["value"] += 10
+    assert cache.pop("b", "default") == "default"
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,122 @@
+"""
+Каталог в памяти: фильтры, пагинация курсором и фасеты
+
+Запуск: python -m pytest -q tests
+"""
+import pytest
+
+from parsers.catalog_index import CatalogIndex
+
+GENRES = {
+    "экшен": ["action", "экшен"],
+    "комедия": ["comedy", "комедия"],
+}
+
+
+def _card(sid: int, rating, year, genres, status="released", type="anime-serial", title=None) -> dict:
+    return {
+        "id": f"z{sid}",
+        "title": title or f"Аниме {sid}",
+        "rating": rating,
+        "year": year,
+        "genres": genres,
+        "status": status,
+        "type": type,
+    }
+
+
+@pytest.fixture
+def index() -> CatalogIndex:
+    index = CatalogIndex(GENRES)
+    index.add(_card(1, "8.5", "2020", ["Экшен"], title="Бета"))
+    index.add(_card(2, 9.0, 2019, ["Комедия", "Экшен"], status="ongoing", title="альфа"))
+    index.add(_card(3, 7.0, 2021, ["Драма"], type="anime", title="Гамма"))
+    index.add(_card(4, None, 2020, ["Action"], title="Дельта"))
+    index.add(_card(5, 8.5, None, ["Comedy"], title="Ёж"))
+    return index
+
+
+def _ids(cards) -> list:
+    return [card["id"] for card in cards]
+
+
+def _walk(index: CatalogIndex, limit: int, **filters) -> list:
+    """Все страницы подряд по курсору"""
+    pages, cursor = [], None
+    while True:
+        cards, has_more, cursor = index.query(limit=limit, cursor=cursor, **filters)
+        pages.append(_ids(cards))
+        if not has_more:
+            assert cursor is None
+            return pages
+
+
+def test_sort_orders(index):
+    assert _ids(index.query(sort="rating")[0]) == ["z2", "z1", "z5", "z3", "z4"]
+    assert _ids(index.query(sort="year")[0]) == ["z3", "z1", "z4", "z2", "z5"]
+    assert _ids(index.query(sort="title")[0]) == ["z2", "z1", "z3", "z4", "z5"]
+    with pytest.raises(ValueError):
+        index.query(sort="popularity")
+
+
+def test_keyset_pagination_covers_everything_once(index):
+    for sort in CatalogIndex.SORTS:
+        pages = _walk(index, 2, sort=sort)
+        assert [len(page) for page in pages] == [2, 2, 1]
+        flat = [sid for page in pages for sid in page]
+        assert flat == _ids(index.query(sort=sort, limit=10)[0])
+
+
+def test_pagination_with_filters(index):
+    assert _walk(index, 1, genre="экшен") == [["z2"], ["z1"], ["z4"]]
+    assert _walk(index, 2, year_from=2020, sort="year") == [["z3", "z1"], ["z4"]]
+
+
+def test_cursor_stable_when_catalog_changes(index):
+    cards, _, cursor = index.query(limit=2)
+    assert _ids(cards) == ["z2", "z1"]
+
+    # Новое аниме выше курсора не сдвигает следующую страницу
+    index.add(_card(6, 9.9, 2022, []))
+    assert _ids(index.query(limit=2, cursor=cursor)[0]) == ["z5", "z3"]
+
+    # Неизвестный курсор — выдача с начала
+    assert _ids(index.query(limit=1, cursor="z999")[0]) == ["z6"]
+
+
+def test_filters(index):
+    assert _ids(index.query(genre="Комедия")[0]) == ["z2", "z5"]
+    assert _ids(index.query(status="ongoing")[0]) == ["z2"]
+    assert _ids(index.query(type="anime")[0]) == ["z3"]
+    assert _ids(index.query(year_from=2020, year_to=2020)[0]) == ["z1", "z4"]
+    assert _ids(index.query(min_rating=8.5)[0]) == ["z2", "z1", "z5"]
+    assert _ids(index.query(min_rating=8.5, sort="title")[0]) == ["z2", "z1", "z5"]
+    assert _ids(index.query(genre="экшен", status="ongoing", year_to=2019)[0]) == ["z2"]
+    assert index.query(status="anons")[0] == []
+
+
+def test_unknown_genre_not_stored(index):
+    # Жанр вне genre_mapping проверяется по карточке и не попадает в индекс
+    assert _ids(index.query(genre="драма")[0]) == ["z3"]
+    assert "драма" not in index._by_genre
+    assert index.genre_counts(["драма"]) == {"драма": 1}
+
+
+def test_facets_and_genre_counts(index):
+    assert index.genre_counts() == {"экшен": 3, "комедия": 2}
+    assert index.facets() == {
+        "status": {"released": 4, "ongoing": 1},
+        "type": {"anime-serial": 4, "anime": 1},
+        "year": {2021: 1, 2020: 2, 2019: 1},
+    }
+
+
+def test_replace_updates_counts_and_order(index):
+    # Порядок уже построен — замена переставляет ключ, а не пересобирает массив
+    index.query(sort="rating")
+    index.add(_card(2, 6.0, 2019, ["Драма"], title="альфа"))
+
+    assert index.genre_counts() == {"экшен": 2, "комедия": 1}
+    assert index.facets()["status"] == {"released": 5}
+    assert _ids(index.query(sort="rating")[0]) == ["z1", "z5", "z3", "z2", "z4"]
+    assert len(index) == 5
@@ -0,0 +1,179 @@
+"""
+Синхронизация каталога: продолжение с курсора и граница high_water
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest  # noqa: E402
+
+from parsers import anime_store, catalog_sync, kodik_api  # noqa: E402
+from parsers.catalog_index import CatalogIndex  # noqa: E402
+from parsers.search_index import SearchIndex  # noqa: E402
+
+NEXT_PAGE = "https://kodikapi.com/list?token=t&next={}&limit=100&sort=updated_at"
+
+
+def _raw(shikimori_id: int, updated_at: str) -> dict:
+    return {"shikimori_id": str(shikimori_id), "title": f"Аниме {shikimori_id}", "updated_at": updated_at}
+
+
+class FakeKodik:
+    """/list по страницам: курсор → (записи, курсор следующей страницы)"""
+
+    def __init__(self, pages) -> None:
+        self.pages = pages
+        self.requested = []
+        self.fail_on = None
+
+    async def api_request(self, endpoint, filters):
+        cursor = filters.get("next")
+        self.requested.append(cursor)
+        if self.fail_on is not None and cursor == self.fail_on:
+            raise ConnectionError("Kodik недоступен")
+        results, next_cursor = self.pages[cursor]
+        return {
+            "results": results,
+            "next_page": NEXT_PAGE.format(next_cursor) if next_cursor else None,
+        }
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Состояние синхронизации и сохранённые записи — в памяти"""
+    state = {"row": {}, "saved": []}
+
+    def save_sync_state(name, **fields):
+        state["row"] = {**state["row"], **fields}
+
+    def save_kodik_items(items):
+        state["saved"].extend(item["shikimori_id"] for item in items)
+        return len(items)
+
+    monkeypatch.setattr(anime_store, "get_sync_state", lambda name: dict(state["row"]))
+    monkeypatch.setattr(anime_store, "save_sync_state", save_sync_state)
+    monkeypatch.setattr(anime_store, "save_kodik_items", save_kodik_items)
+    return state
+
+
+def _use_parser(monkeypatch, parser: FakeKodik) -> None:
+    async def get_kodik_parser():
+        return parser
+    monkeypatch.setattr(catalog_sync, "get_kodik_parser", get_kodik_parser)
+
+
+FULL_PAGES = {
+    None: ([_raw(1, "2026-10-03T10:00:00Z"), _raw(2, "2026-10-03T09:00:00Z")], "c2"),
+    "c2": ([_raw(3, "2026-10-02T10:00:00Z"), _raw(4, "2026-10-02T09:00:00Z")], "c3"),
+    "c3": ([_raw(5, "2026-10-01T10:00:00Z")], None),
+}
+
+
+def test_full_pass_switches_to_incremental(monkeypatch, store):
+    parser = FakeKodik(FULL_PAGES)
+    _use_parser(monkeypatch, parser)
+
+    assert asyncio.run(catalog_sync.sync_once()) == 5
+    assert parser.requested == [None, "c2", "c3"]
+    assert store["row"]["phase"] == "incremental"
+    assert store["row"]["cursor"] is None
+    assert store["row"]["high_water"] == "2026-10-03T10:00:00Z"
+    assert store["row"]["pending_high_water"] is None
+    assert store["row"]["synced_items"] == 5
+
+
+def test_resume_from_saved_cursor(monkeypatch, store):
+    parser = FakeKodik(FULL_PAGES)
+    parser.fail_on = "c3"
+    _use_parser(monkeypatch, parser)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(catalog_sync.sync_once())
+    # Курсор и максимум updated_at сохранены после каждой страницы, high_water ещё не сдвинут
+    assert store["row"]["phase"] == "full"
+    assert store["row"]["cursor"] == "c3"
+    assert store["row"]["pending_high_water"] == "2026-10-03T10:00:00Z"
+    assert "high_water" not in store["row"]
+
+    parser.fail_on = None
+    parser.requested.clear()
+    assert asyncio.run(catalog_sync.sync_once()) == 1
+    assert parser.requested == ["c3"]
+    assert store["row"]["phase"] == "incremental"
+    assert store["row"]["high_water"] == "2026-10-03T10:00:00Z"
+    assert store["saved"] == ["1", "2", "3", "4", "5"]
+
+
+def test_incremental_stops_at_high_water(monkeypatch, store):
+    store["row"] = {"phase": "incremental", "high_water": "2026-10-03T10:00:00Z", "synced_items": 5}
+    parser = FakeKodik({
+        None: ([_raw(6, "2026-10-04T08:00:00Z"), _raw(1, "2026-10-03T10:00:00Z"),
+                _raw(2, "2026-10-03T09:00:00Z")], "c2"),
+        "c2": ([_raw(3, "2026-10-02T10:00:00Z")], None),
+    })
+    _use_parser(monkeypatch, parser)
+
+    # Запись с updated_at == high_water сохраняется повторно (несколько записей с одной меткой)
+    assert asyncio.run(catalog_sync.sync_once()) == 2
+    assert store["saved"] == ["6", "1"]
+    assert parser.requested == [None]
+    assert store["row"]["high_water"] == "2026-10-04T08:00:00Z"
+    assert store["row"]["synced_items"] == 7
+
+
+def test_incremental_without_changes_keeps_high_water(monkeypatch, store):
+    store["row"] = {"phase": "incremental", "high_water": "2026-10-03T10:00:00Z"}
+    parser = FakeKodik({None: ([], None)})
+    _use_parser(monkeypatch, parser)
+
+    assert asyncio.run(catalog_sync.sync_once()) == 0
+    assert store["row"]["high_water"] == "2026-10-03T10:00:00Z"
+
+
+def test_cursor_read_from_any_parameter_position(monkeypatch):
+    class Parser:
+        async def api_request(self, endpoint, filters):
+            return {"results": [], "next_page": "https://kodikapi.com/list?next=abc%3D%3D&token=t"}
+
+    _, cursor = asyncio.run(catalog_sync._fetch_page(Parser(), None))
+    assert cursor == "abc=="
+
+
+def test_api_reload_picks_only_newer_records(monkeypatch):
+    """API подхватывает из хранилища только записи новее прошлой загрузки"""
+    def record(shikimori_id: int, title: str, hour: int) -> dict:
+        row = anime_store.record_from_kodik_item({"shikimori_id": str(shikimori_id), "title": title})
+        return {**row, "updated_at": datetime(2026, 10, 3, hour, tzinfo=timezone.utc)}
+
+    table = [record(1, "Наруто", 9), record(2, "Блич", 10)]
+    requested = []
+
+    def get_catalog(updated_since=None):
+        requested.append(updated_since)
+        # Граница включительная, как >= в SQL
+        return [r for r in table if updated_since is None or r["updated_at"] >= updated_since]
+
+    async def sync_not_fresh():
+        return False
+
+    monkeypatch.setattr(anime_store, "get_catalog", get_catalog)
+    monkeypatch.setattr(kodik_api, "_catalog_sync_fresh", sync_not_fresh)
+    monkeypatch.setattr(kodik_api, "_store_high_water", None)
+    monkeypatch.setattr(kodik_api, "_search_index", SearchIndex(kodik_api.normalize_search_text))
+    monkeypatch.setattr(kodik_api, "_catalog_index", CatalogIndex(kodik_api.GENRE_MAPPING))
+
+    async def scenario():
+        assert await kodik_api.reload_from_store() == 2
+        assert await kodik_api.reload_from_store() == 0
+
+        table.append(record(1, "Наруто (обновлено)", 11))
+        assert await kodik_api.reload_from_store() == 1
+        assert kodik_api._search_index.card("z1")["title"] == "Наруто (обновлено)"
+
+    asyncio.run(scenario())
+    high_water = datetime(2026, 10, 3, 10, tzinfo=timezone.utc)
+    assert requested == [None, high_water, high_water]
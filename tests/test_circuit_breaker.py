@@ -0,0 +1,169 @@
+"""
+Circuit breaker: переходы состояний и классификация ошибок upstream
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import aiohttp  # noqa: E402
+import pytest  # noqa: E402
+from anime_parsers_ru import errors as parser_errors  # noqa: E402
+
+from parsers.circuit_breaker import CircuitBreaker, CircuitOpenError  # noqa: E402
+from parsers.http_client import LimiterWait  # noqa: E402
+from parsers.kodik_api import _is_upstream_failure  # noqa: E402
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise parser_errors.ServiceError('Сервер не вернул ожидаемый код 200. Код: "503"')
+
+
+async def _not_found():
+    raise parser_errors.NoResults("Не найдено")
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.1)
+
+
+def test_opens_on_failure_rate():
+    breaker = CircuitBreaker("test", window=10, min_calls=4, failure_rate=0.5)
+    for ok in (True, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == "closed"
+    breaker.record(False, 0.1)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_open_rejects_then_half_open_probe():
+    breaker = CircuitBreaker("test", min_calls=2, open_seconds=0.05)
+    _trip(breaker)
+
+    async def scenario():
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_ok)
+        assert breaker.rejected == 1
+
+        await asyncio.sleep(0.06)
+        # Пробный запрос неудачен — снова open
+        with pytest.raises(parser_errors.ServiceError):
+            await breaker.call(_fail)
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        assert await breaker.call(_ok) == "ok"
+        assert breaker.state == "closed"
+        assert breaker.stats()["window_calls"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_single_probe():
+    breaker = CircuitBreaker("test", min_calls=2, open_seconds=0)
+    _trip(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_on_half_open_replaces_user_probe():
+    probes = []
+    breaker = CircuitBreaker("test", min_calls=2, open_seconds=0, on_half_open=lambda: probes.append(1))
+    _trip(breaker)
+    assert not breaker.allow()
+    assert breaker.state == "half_open"
+    assert probes == [1]
+
+    # poll повторяет пробу, пока она не ушла
+    breaker.poll()
+    assert probes == [1, 1]
+
+
+def test_ignored_and_classified_errors_are_not_failures():
+    breaker = CircuitBreaker("test", min_calls=2)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(parser_errors.NoResults):
+                await breaker.call(_not_found, ignore=(parser_errors.NoResults,))
+            with pytest.raises(parser_errors.ServiceError):
+                await breaker.call(_fail, is_failure=lambda e: False)
+        assert breaker.state == "closed"
+        assert breaker.stats()["failure_rate"] == 0.0
+
+    asyncio.run(scenario())
+
+
+def test_timeout_and_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test", min_calls=2)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(slow, timeout=0.01)
+        assert await breaker.call(slow, slow_after=0.01) == "slow"
+        assert breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_paused_time_excluded_from_timeout_and_latency():
+    breaker = CircuitBreaker("test", min_calls=100)
+    wait = LimiterWait()
+
+    async def queued():
+        # 0.1 с в очереди лимитера, 0.02 с — сам запрос
+        wait.start()
+        await asyncio.sleep(0.1)
+        wait.stop()
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        assert await breaker.call(queued, timeout=0.05, slow_after=0.05, paused=wait) == "ok"
+        assert breaker.stats()["failure_rate"] == 0.0
+        assert breaker.stats()["avg_latency"] < 0.05
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("error, expected", [
+    # Kodik
+    (parser_errors.ServiceError('Произошла ошибка при запросе к kodik api. Ожидался код "200", получен: "502"'), True),
+    (parser_errors.ServiceError('Произошла ошибка при запросе. Ожидался код "200", получен: "500"'), True),
+    (parser_errors.ServiceError('Произошла ошибка при запросе. Ожидался код "200", получен: "429"'), True),
+    (parser_errors.ServiceError('Произошла ошибка при запросе. Ожидался код "200", получен: "404"'), False),
+    (parser_errors.ServiceError("Произошла ошибка при получении данных. Ответ сервера не является json"), False),
+    # Shikimori
+    (parser_errors.ServiceError('Сервер не вернул ожидаемый код 200. Код: "503"'), True),
+    (parser_errors.ServiceError('Сервер не вернул ожидаемый код 200. Код: "403"'), False),
+    (parser_errors.ServiceError(
+        "Произошла непредвиденная ошибка при получении данных о списке аниме. "
+        "Ожидался статус ответа 200. Получен: ", 502
+    ), True),
+    (parser_errors.TooManyRequests("Сервер вернул код 429 для обозначения что запросы выполняются слишком часто."), True),
+    (parser_errors.ServiceIsOverloaded(
+        "Сервер вернул статус ответа 520, что означает что он перегружен и не может ответить сразу."
+    ), True),
+    # Сеть
+    (asyncio.TimeoutError(), True),
+    (aiohttp.ClientConnectionError("reset"), True),
+    (OSError("Network is unreachable"), True),
+    # Ошибки запроса
+    (parser_errors.NoResults("Не найдено"), False),
+    (ValueError("bad"), False),
+])
+def test_is_upstream_failure(error, expected):
+    assert _is_upstream_failure(error) is expected
@@ -0,0 +1,53 @@
+"""
+Срок подписанной ссылки Kodik и TTL кеша m3u8
+
+Запуск: python -m pytest -q tests
+"""
+import os
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from parsers import kodik_api  # noqa: E402
+from parsers.kodik_api import _m3u8_ttl, _parse_link_expiry  # noqa: E402
+
+LINK = "//cloud.kodik-storage.com/useruploads/0b1c/8f3e9a:{}/"
+
+
+def test_moscow_hour_signature():
+    # 2026-10-17 12:00 МСК = 09:00 UTC
+    expected = datetime(2026, 10, 17, 9, tzinfo=timezone.utc).timestamp()
+    assert _parse_link_expiry(LINK.format("2026101712")) == expected
+    assert _parse_link_expiry(LINK.format("2026101712") + "720.mp4:hls:manifest.m3u8") == expected
+
+
+def test_unix_timestamp_signature():
+    assert _parse_link_expiry(LINK.format("1792224000")) == 1792224000.0
+    # После 2033 года unix time тоже начинается с "20", но не читается как дата
+    assert _parse_link_expiry(LINK.format("2000000000")) == 2000000000.0
+
+
+def test_unrecognized_link():
+    assert _parse_link_expiry("//cloud.kodik-storage.com/useruploads/0b1c/8f3e9a/") is None
+    # 9 или 11 цифр — не подпись
+    assert _parse_link_expiry(LINK.format("179222400")) is None
+    assert _parse_link_expiry(LINK.format("17922240000")) is None
+
+
+def test_ttl_from_signature(monkeypatch):
+    monkeypatch.setattr(kodik_api, "M3U8_EXPIRY_MARGIN", 600)
+    monkeypatch.setattr(kodik_api, "M3U8_CACHE_MAX_TTL", 6 * 3600)
+    now = time.time()
+
+    ttl = _m3u8_ttl(LINK.format(int(now + 3600)))
+    assert 2990 <= ttl <= 3000
+
+    # Не дольше M3U8_CACHE_MAX_TTL и не меньше нуля
+    assert _m3u8_ttl(LINK.format(int(now + 48 * 3600))) == 6 * 3600
+    assert _m3u8_ttl(LINK.format(int(now + 60))) == 0.0
+
+
+def test_ttl_without_signature(monkeypatch):
+    monkeypatch.setattr(kodik_api, "M3U8_CACHE_DEFAULT_TTL", 1800)
+    assert _m3u8_ttl("//cloud.kodik-storage.com/useruploads/0b1c/") == 1800
@@ -0,0 +1,149 @@
+"""
+Деградированный режим auto: вход при отказах Kodik и выход после пробного запроса
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from anime_parsers_ru import errors as parser_errors  # noqa: E402
+
+from parsers import kodik_api  # noqa: E402
+from parsers.circuit_breaker import CircuitBreaker  # noqa: E402
+from parsers.parser_pool import ParserPool  # noqa: E402
+
+
+class FakeKodik:
+    """Парсер Kodik: пока down — 503, потом пустой список"""
+
+    def __init__(self) -> None:
+        self.down = True
+        self.calls = 0
+
+    async def get_list(self, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise parser_errors.ServiceError('Ожидался код "200", получен: "503"')
+        return [], None
+
+
+def _setup(monkeypatch) -> FakeKodik:
+    parser = FakeKodik()
+
+    async def get_kodik_parser():
+        return parser
+
+    monkeypatch.setattr(kodik_api, "OFFLINE_MODE", "auto")
+    monkeypatch.setattr(kodik_api, "get_kodik_parser", get_kodik_parser)
+    monkeypatch.setattr(kodik_api, "_store_in_background", lambda *args: None)
+    monkeypatch.setattr(kodik_api, "_kodik_breaker", CircuitBreaker(
+        "kodik",
+        open_seconds=0.05,
+        on_half_open=kodik_api._on_kodik_half_open
+    ))
+    return parser
+
+
+def test_auto_offline_enters_and_recovers(monkeypatch):
+    parser = _setup(monkeypatch)
+
+    async def scenario():
+        assert not kodik_api.is_offline()
+
+        # Отказы Kodik открывают breaker → деградированный режим
+        for _ in range(5):
+            assert await kodik_api._load_trending_anime(12) is None
+        assert kodik_api.is_offline()
+
+        # Kodik вернулся; пользовательские запросы в него не ходят — только фоновый poll
+        parser.down = False
+        calls = parser.calls
+        await asyncio.sleep(0.1)
+        kodik_api._poll_kodik_breaker()
+        await asyncio.sleep(0.05)
+
+        assert parser.calls > calls
+        assert kodik_api._kodik_breaker.state == "closed"
+        assert not kodik_api.is_offline()
+
+    asyncio.run(scenario())
+
+
+def test_auto_offline_stays_while_probe_fails(monkeypatch):
+    parser = _setup(monkeypatch)
+
+    async def scenario():
+        for _ in range(5):
+            await kodik_api._load_trending_anime(12)
+        assert kodik_api.is_offline()
+
+        # До open_seconds poll не шлёт запросов
+        calls = parser.calls
+        kodik_api._poll_kodik_breaker()
+        await asyncio.sleep(0)
+        assert parser.calls == calls
+
+        # Пробный запрос неудачен — breaker снова open, режим не снимается
+        await asyncio.sleep(0.1)
+        kodik_api._poll_kodik_breaker()
+        await asyncio.sleep(0.05)
+        assert parser.calls == calls + 1
+        assert kodik_api._kodik_breaker.state == "open"
+        assert kodik_api.is_offline()
+
+    asyncio.run(scenario())
+
+
+class FakeShikimori:
+    pass
+
+
+def test_auto_offline_when_parser_init_fails(monkeypatch):
+    """Без сети падает уже получение токена Kodik — это тоже отказ upstream"""
+    attempts = []
+
+    def create_kodik_parsers(count):
+        attempts.append(count)
+        raise OSError("Network is unreachable")
+
+    async def no_posters(ids):
+        return {}
+
+    monkeypatch.setattr(kodik_api, "OFFLINE_MODE", "auto")
+    monkeypatch.setattr(kodik_api, "_create_kodik_parsers", create_kodik_parsers)
+    monkeypatch.setattr(kodik_api, "ShikimoriParserAsync", FakeShikimori)
+    monkeypatch.setattr(kodik_api, "get_posters_batch", no_posters)
+    monkeypatch.setattr(kodik_api, "_kodik_pool", ParserPool("kodik"))
+    monkeypatch.setattr(kodik_api, "_shikimori_pool", ParserPool("shikimori"))
+    monkeypatch.setattr(kodik_api, "_kodik_breaker", CircuitBreaker("kodik", open_seconds=60))
+    kodik_api._index_kodik_items([{
+        "shikimori_id": "990001",
+        "title": "Офлайн тестовое аниме",
+        "screenshots": [],
+        "material_data": {},
+    }])
+
+    async def scenario():
+        # Пул Shikimori заполняется независимо от Kodik
+        try:
+            await kodik_api.init_parsers()
+        except OSError:
+            pass
+        assert kodik_api._shikimori_pool.ready
+        assert not kodik_api._kodik_pool.ready
+
+        # Запросы не падают, а отказы копятся в breaker
+        for _ in range(4):
+            assert await kodik_api._load_trending_anime(12) is None
+        assert kodik_api.is_offline()
+
+        # Дальше — локальные данные без попыток создать парсер
+        attempts.clear()
+        results = await kodik_api.search_anime("Офлайн тестовое аниме", 5)
+        assert [r["id"] for r in results] == ["z990001"]
+        assert results[0]["stale"] is True
+        assert attempts == []
+
+    asyncio.run(scenario())
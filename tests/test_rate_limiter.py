@@ -0,0 +1,131 @@
+"""
+Адаптивный лимитер: back-off, Retry-After и очередь вне таймаутов
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+
+from parsers import http_client
+from parsers.circuit_breaker import CircuitBreaker
+from parsers.http_client import LimiterWait, RateLimitedSession, tracking_limiter_wait
+from parsers.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    moment = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(moment, usegmt=True)) <= 30
+    past = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+def test_backoff_and_recovery():
+    limiter = AdaptiveRateLimiter("test", rate=10, min_rate=2, max_rate=11, increase=0.5, decrease=0.5)
+
+    limiter.on_response(503)
+    assert limiter.rate == 5
+    # Не чаще раза в секунду
+    limiter.on_response(429)
+    assert limiter.rate == 5
+    assert limiter.throttled == 2
+
+    limiter._last_decrease -= 1
+    limiter.on_response(500)
+    limiter._last_decrease -= 1
+    limiter.on_response(500)
+    assert limiter.rate == 2
+
+    for _ in range(30):
+        limiter.on_response(200)
+    assert limiter.rate == 11
+
+
+def test_retry_after_blocks_tokens():
+    limiter = AdaptiveRateLimiter("test", rate=100, burst=5, max_retry_after=0.2)
+
+    async def scenario():
+        # Retry-After больше max_retry_after — ограничивается им
+        limiter.on_response(429, "60")
+        assert 0 < limiter.stats()["blocked_for"] <= 0.2
+        started = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started >= 0.15
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_paces_requests():
+    limiter = AdaptiveRateLimiter("test", rate=20, burst=2)
+
+    async def scenario():
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+        # 2 токена сразу, ещё 4 — по 1/20 с
+        assert time.monotonic() - started >= 0.18
+        assert limiter.requests == 6
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def slow_limit(monkeypatch):
+    """Лимит 10 запросов/сек без запаса и общий таймаут aiohttp 0.3 с"""
+    monkeypatch.setattr(http_client, "RATE_LIMIT_INITIAL", 10)
+    monkeypatch.setattr(http_client, "RATE_LIMIT_BURST", 1)
+    monkeypatch.setattr(http_client, "HTTP_TOTAL_TIMEOUT", 0.3)
+    monkeypatch.setattr(http_client, "_rate_limiters", {})
+    monkeypatch.setattr(http_client, "_session", None)
+
+
+def test_queued_wait_outside_timeouts(slow_limit):
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        return web.Response(text="ok")
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        session = RateLimitedSession()
+        breaker = CircuitBreaker("test", min_calls=100)
+
+        async def call():
+            wait = LimiterWait()
+
+            async def request():
+                with tracking_limiter_wait(wait):
+                    async with session.request("get", f"http://127.0.0.1:{port}/") as response:
+                        return await response.text()
+
+            return await breaker.call(request, timeout=0.3, slow_after=0.2, paused=wait)
+
+        try:
+            # 10 запросов при 10/сек: последний ждёт в очереди ~0.9 с — больше обоих таймаутов
+            started = time.monotonic()
+            results = await asyncio.gather(*(call() for _ in range(10)))
+            assert time.monotonic() - started >= 0.8
+            assert results == ["ok"] * 10
+
+            stats = breaker.stats()
+            assert stats["failure_rate"] == 0.0
+            assert stats["avg_latency"] < 0.2
+            assert http_client.get_rate_limiter_stats()["127.0.0.1"]["requests"] == 10
+        finally:
+            await http_client.close_http_session()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,154 @@
+"""
+Кеш поиска: полный ответ (complete) и ответы по более короткому запросу
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest  # noqa: E402
+from anime_parsers_ru import errors as parser_errors  # noqa: E402
+
+from parsers import kodik_api  # noqa: E402
+from parsers.cache import TTLCache  # noqa: E402
+from parsers.catalog_index import CatalogIndex  # noqa: E402
+from parsers.circuit_breaker import CircuitBreaker  # noqa: E402
+from parsers.search_index import SearchIndex  # noqa: E402
+
+
+def _card(shikimori_id: str, title: str) -> dict:
+    return {"id": f"z{shikimori_id}", "title": title, "title_orig": None, "poster": None}
+
+
+def _item(shikimori_id: int, title: str) -> dict:
+    return {"shikimori_id": str(shikimori_id), "title": title, "screenshots": [], "material_data": {}}
+
+
+class FakeKodik:
+    """search отдаёт заданные записи по каждому варианту запроса (errors — ошибки по варианту)"""
+
+    def __init__(self, results=None, error=None, errors=None) -> None:
+        self.results = results or []
+        self.error = error
+        self.errors = errors or {}
+
+    async def search(self, title, limit, **kwargs):
+        error = self.errors.get(title, self.error)
+        if error is not None:
+            raise error
+        return self.results[:limit]
+
+
+@pytest.fixture
+def search_state(monkeypatch):
+    monkeypatch.setattr(kodik_api, "_search_cache", TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(kodik_api, "_search_index", SearchIndex(kodik_api.normalize_search_text))
+    monkeypatch.setattr(kodik_api, "_catalog_index", CatalogIndex(kodik_api.GENRE_MAPPING))
+    monkeypatch.setattr(kodik_api, "_kodik_breaker", CircuitBreaker("kodik"))
+    monkeypatch.setattr(kodik_api, "_store_in_background", lambda *args: None)
+    monkeypatch.setattr(kodik_api, "SEARCH_KODIK_OVERFETCH", 2)
+
+    def use_parser(parser):
+        async def get_kodik_parser():
+            return parser
+        monkeypatch.setattr(kodik_api, "get_kodik_parser", get_kodik_parser)
+
+    return use_parser
+
+
+# ─── _get_cached_search ───
+
+def test_exact_entry_with_smaller_limit_needs_complete(search_state):
+    results = [_card("1", "Наруто"), _card("2", "Наруто 2")]
+
+    kodik_api._cache_search("наруто", 2, results, False)
+    assert kodik_api._get_cached_search("наруто", 2) == results
+    # Срез по limit=2 мог отбросить совпадения
+    assert kodik_api._get_cached_search("наруто", 5) is None
+
+    kodik_api._cache_search("наруто", 2, results, True)
+    assert kodik_api._get_cached_search("наруто", 5) == results
+
+
+def test_longer_query_served_from_complete_prefix(search_state):
+    results = [_card("1", "Наруто"), _card("2", "Наруто: Ураганные хроники"), _card("3", "Нарвал")]
+    kodik_api._cache_search("нару", 12, results, True)
+
+    assert [r["id"] for r in kodik_api._get_cached_search("наруто", 12)] == ["z1", "z2"]
+    assert [r["id"] for r in kodik_api._get_cached_search("наруто ураган", 12)] == ["z2"]
+    # Короче SEARCH_CACHE_MIN_PREFIX префиксы не проверяются
+    kodik_api._search_cache.clear()
+    kodik_api._cache_search("на", 12, results, True)
+    assert kodik_api._get_cached_search("наруто", 12) is None
+
+
+def test_incomplete_prefix_is_not_used(search_state):
+    kodik_api._cache_search("нару", 12, [_card("1", "Наруто")], False)
+    assert kodik_api._get_cached_search("наруто", 12) is None
+
+
+def test_prefix_without_matches_falls_through(search_state):
+    kodik_api._cache_search("нару", 12, [_card("1", "Наруто")], True)
+    assert kodik_api._get_cached_search("нарвал", 12) is None
+
+
+# ─── complete в _search_kodik ───
+
+def test_kodik_answer_below_fetch_limit_is_complete(search_state):
+    search_state(FakeKodik([_item(1, "Наруто"), _item(2, "Наруто: Ураганные хроники")]))
+
+    ranked, complete = asyncio.run(kodik_api._search_kodik("наруто", 5))
+    assert [card["id"] for card in ranked] == ["z1", "z2"]
+    assert complete
+
+
+def test_kodik_answer_at_fetch_limit_is_incomplete(search_state):
+    # limit=2, SEARCH_KODIK_OVERFETCH=2 → fetch_limit=4
+    search_state(FakeKodik([_item(i, f"Наруто {i}") for i in range(1, 5)]))
+
+    ranked, complete = asyncio.run(kodik_api._search_kodik("наруто", 2))
+    assert len(ranked) == 2
+    assert not complete
+
+
+def test_more_matches_than_limit_is_incomplete(search_state):
+    search_state(FakeKodik([_item(i, f"Наруто {i}") for i in range(1, 4)]))
+
+    ranked, complete = asyncio.run(kodik_api._search_kodik("наруто", 2))
+    assert len(ranked) == 2
+    assert not complete
+
+
+def test_all_variants_failed_is_error(search_state):
+    search_state(FakeKodik(error=parser_errors.ServiceError('Ожидался код "200", получен: "502"')))
+    # Все варианты упали — ошибка, а не пустой полный ответ
+    assert asyncio.run(kodik_api._search_kodik("наруто", 5)) is None
+
+
+def test_variant_without_results_keeps_complete(search_state):
+    # "нет результатов" по одному варианту — это ответ Kodik, а не пропуск
+    search_state(FakeKodik([_item(1, "Ван Пис")], errors={"ван-пис": parser_errors.NoResults("Не найдено")}))
+
+    ranked, complete = asyncio.run(kodik_api._search_kodik("ван пис", 5))
+    assert [card["id"] for card in ranked] == ["z1"]
+    assert complete
+
+
+def test_failed_single_variant_is_incomplete(search_state):
+    search_state(FakeKodik([_item(1, "Ван Пис")], errors={
+        "ван-пис": parser_errors.ServiceError('Ожидался код "200", получен: "502"')
+    }))
+
+    ranked, complete = asyncio.run(kodik_api._search_kodik("ван пис", 5))
+    assert [card["id"] for card in ranked] == ["z1"]
+    assert not complete
+
+
+def test_full_local_page_is_incomplete(search_state):
+    search_state(FakeKodik([_item(1, "Наруто")]))
+    local = [{**_card(str(i), f"Наруто {i}"), "_relevance": 0.5} for i in range(10, 12)]
+
+    _, complete = asyncio.run(kodik_api._search_kodik("наруто", 2, local))
+    assert not complete
@@ -0,0 +1,93 @@
+"""
+Триграммный индекс: оценки, замена аниме и автодополнение
+
+Запуск: python -m pytest -q tests
+"""
+import pytest
+
+from parsers.search_index import SearchIndex, trigrams
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    index = SearchIndex(_normalize)
+    index.add({"id": "z20", "title": "Наруто", "rating": 8.0}, ["Наруто", "Naruto"])
+    index.add({"id": "z1735", "title": "Наруто: Ураганные хроники", "rating": 8.3},
+              ["Наруто: Ураганные хроники", "Naruto: Shippuuden"])
+    index.add({"id": "z1", "title": "Ковбой Бибоп", "rating": 8.8}, ["Ковбой Бибоп", "Cowboy Bebop"])
+    return index
+
+
+def test_trigrams_pg_trgm_padding():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+    assert trigrams("Ab, ab") == {"  a", " ab", "ab "}
+    assert trigrams("") == set()
+
+
+def test_exact_title_scores_above_continuation(index):
+    scores = index.scores("наруто")
+    # Запрос целиком входит в оба названия, но точное совпадение — 1.0
+    assert scores["z20"] == pytest.approx(1.0)
+    assert 0.8 < scores["z1735"] < 1.0
+    assert "z1" not in scores
+
+
+def test_search_ranks_by_score_then_rating(index):
+    assert [sid for sid, _ in index.search("наруто")] == ["z20", "z1735"]
+    assert [sid for sid, _ in index.search("naruto shippuuden")][0] == "z1735"
+    # Опечатка: часть триграмм совпадает
+    assert index.search("ковбой бибап", limit=1)[0][0] == "z1"
+    assert index.search("наруто", min_score=0.99) == [("z20", 1.0)]
+
+
+def test_best_title_wins(index):
+    # Оценка аниме — лучшая среди его названий (латинское название Cowboy Bebop)
+    assert index.scores("cowboy bebop")["z1"] == pytest.approx(1.0)
+
+
+def test_replace_drops_old_postings(index):
+    trigram_count = index.stats()["trigrams"]
+    index.add({"id": "z1", "title": "Cowboy Bebop", "rating": 8.8}, ["Cowboy Bebop"])
+
+    assert "z1" not in index.scores("ковбой")
+    assert index.scores("cowboy bebop")["z1"] == pytest.approx(1.0)
+    # Триграммы только кириллического названия ушли из индекса
+    assert " ко" not in index._postings
+    assert index.stats()["trigrams"] < trigram_count
+    assert all(entry in index._entries for entries in index._postings.values() for entry in entries)
+
+
+def test_repeated_replace_keeps_postings_bounded(index):
+    sizes = set()
+    for rating in range(5):
+        index.add({"id": "z20", "title": "Наруто", "rating": rating}, ["Наруто", "Naruto"])
+        sizes.add(sum(len(entries) for entries in index._postings.values()))
+    assert len(sizes) == 1
+    assert index.card("z20")["rating"] == 4
+
+
+def test_add_without_titles_removes(index):
+    index.add({"id": "z20", "title": "Наруто"}, [])
+    assert "z20" not in index
+    assert "z20" not in index.scores("наруто")
+
+
+def test_suggest_prefix(index):
+    # Точное совпадение первым, дальше по рейтингу
+    assert index.suggest("наруто") == ["z20", "z1735"]
+    assert index.suggest("нар") == ["z1735", "z20"]
+    assert index.suggest("cow") == ["z1"]
+    assert index.suggest("naruto: s") == ["z1735"]
+    assert index.suggest("xyz") == []
+    assert index.suggest("  ") == []
+    assert index.suggest("нар", limit=1) == ["z1735"]
+
+
+def test_suggest_follows_replace(index):
+    index.add({"id": "z1", "title": "Cowboy Bebop", "rating": 8.8}, ["Cowboy Bebop"])
+    assert index.suggest("ковбой") == []
+    assert index.suggest("cowboy") == ["z1"]
@@ -0,0 +1,116 @@
+"""
+Single-flight: объединение одинаковых запросов и отмена ожидающих
+
+Запуск: python -m pytest -q tests
+"""
+import asyncio
+
+import pytest
+
+from parsers.singleflight import SingleFlight
+
+
+class Upstream:
+    """Запрос, который ждёт release; считает запуски и отмены"""
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self, value="ok"):
+        self.started += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return value
+
+
+def test_concurrent_calls_share_one_request():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [asyncio.create_task(flight.do("key", upstream.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+
+        assert await asyncio.gather(*waiters) == ["ok"] * 5
+        assert upstream.started == 1
+        assert flight.stats()["deduplicated"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_is_shared():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        results = await asyncio.gather(
+            *(flight.do("key", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_keeps_request_for_others():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        first = asyncio.create_task(flight.do("key", upstream.fetch))
+        second = asyncio.create_task(flight.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+
+        assert await second == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert upstream.cancelled == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_all_waiters_cancels_request():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [asyncio.create_task(flight.do("key", upstream.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert upstream.cancelled == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_call_after_cancel_starts_fresh_request():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        first = asyncio.create_task(flight.do("key", upstream.fetch))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        # Запрос ещё отменяется, а новый вызов уже пришёл
+        second = asyncio.create_task(flight.do("key", lambda: upstream.fetch("fresh")))
+        await asyncio.sleep(0)
+        upstream.release.set()
+
+        assert await second == "fresh"
+        assert upstream.started == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+"""
+Варианты написания запроса: раскладка клавиатуры и транслитерация
+
+Запуск: python -m pytest -q tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest  # noqa: E402
+
+from parsers import kodik_api  # noqa: E402
+from parsers.kodik_api import create_spelling_variants  # noqa: E402
+from parsers.search_index import SearchIndex  # noqa: E402
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Набрано не в той раскладке
+    ("yfhenj", "наруто"),
+    ("тфкгещ", "naruto"),
+    # Транслитерация в обе стороны
+    ("naruto", "наруто"),
+    ("наруто", "naruto"),
+    ("shingeki no kyojin", "сингеки но кеджин"),
+    ("jujutsu", "джуджуцу"),
+    ("тетрадь смерти", "tetrad smerti"),
+])
+def test_variants_contain(query, expected):
+    assert expected in create_spelling_variants(query)
+
+
+def test_original_first_and_normalized():
+    assert create_spelling_variants("  Наруто [ТВ-1] ") == ["наруто", "yfhenj", "naruto"]
+    # ё → е после транслитерации
+    assert create_spelling_variants("ёжик")[0] == "ежик"
+    assert "yozhik" in create_spelling_variants("ёжик")
+
+
+def test_no_letters_no_variants():
+    assert create_spelling_variants("42") == ["42"]
+    assert create_spelling_variants("   ") == []
+
+
+def test_variants_are_unique():
+    variants = create_spelling_variants("aaa")
+    assert len(variants) == len(set(variants))
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = SearchIndex(kodik_api.normalize_search_text)
+    index.add({"id": "z20", "title": "Наруто"}, ["Наруто"])
+    index.add({"id": "z1", "title": "Cowboy Bebop"}, ["Cowboy Bebop"])
+    monkeypatch.setattr(kodik_api, "_search_index", index)
+    return index
+
+
+def test_best_spelling_fixes_layout(index):
+    assert kodik_api._best_spelling("yfhenj") == "наруто"
+    assert kodik_api._best_spelling("сщцищн иуищз") == "cowboy bebop"
+
+
+def test_best_spelling_keeps_original_when_it_matches(index):
+    assert kodik_api._best_spelling("наруто") == "наруто"
+    # Нет совпадений ни у одного варианта — исходный запрос
+    assert kodik_api._best_spelling("qwerty") == "qwerty"